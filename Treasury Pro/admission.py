@@ -0,0 +1,104 @@
+"""Admission control for cold (uncached) stock analyses.
+
+A cold fetch_financial_data run makes dozens of upstream calls and holds a
+thread for up to a minute. The controller lets at most MAX_CONCURRENT of
+them run at once, queues up to MAX_QUEUE more for at most QUEUE_TIMEOUT
+seconds, and sheds anything beyond that with Overloaded, which the API
+turns into 503 + Retry-After. Cache hits never go through the controller.
+"""
+import os
+import math
+import time
+import threading
+from contextlib import contextmanager
+
+MAX_CONCURRENT = int(os.environ.get('TREASURYPRO_MAX_ANALYSES', '4'))
+MAX_QUEUE = int(os.environ.get('TREASURYPRO_ANALYSIS_QUEUE', '8'))
+QUEUE_TIMEOUT = float(os.environ.get('TREASURYPRO_QUEUE_TIMEOUT', '10'))
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed; retry_after is a hint in seconds"""
+
+    def __init__(self, retry_after, reason='queue full'):
+        super().__init__(f"Overloaded ({reason}), retry after {retry_after}s")
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class AdmissionController:
+    """Bounded concurrency with a short, bounded wait queue"""
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT, max_queue=MAX_QUEUE, queue_timeout=QUEUE_TIMEOUT):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.peak_waiting = 0
+        self.admitted = 0
+        self.fast_path = 0
+        self.shed = 0
+        self.timed_out = 0
+        # Smoothed duration of an admitted analysis, used for Retry-After
+        self.avg_seconds = 30.0
+
+    def retry_after(self):
+        """Rough seconds until a slot frees up for a new arrival"""
+        batches = (self.active + self.waiting) / max(self.max_concurrent, 1)
+        return int(min(120, max(1, math.ceil(self.avg_seconds * max(batches, 1) / 2))))
+
+    @contextmanager
+    def admit(self):
+        with self._cond:
+            if self.active >= self.max_concurrent:
+                if self.waiting >= self.max_queue:
+                    self.shed += 1
+                    raise Overloaded(self.retry_after())
+                self.waiting += 1
+                self.peak_waiting = max(self.peak_waiting, self.waiting)
+                deadline = time.monotonic() + self.queue_timeout
+                try:
+                    while self.active >= self.max_concurrent:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.shed += 1
+                            self.timed_out += 1
+                            raise Overloaded(self.retry_after(), 'queue timeout')
+                        self._cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            self.active += 1
+            self.admitted += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            with self._cond:
+                self.active -= 1
+                self.avg_seconds = 0.8 * self.avg_seconds + 0.2 * elapsed
+                self._cond.notify()
+
+    def record_fast_path(self):
+        with self._cond:
+            self.fast_path += 1
+
+    def stats(self):
+        with self._cond:
+            return {
+                'maxConcurrent': self.max_concurrent,
+                'maxQueue': self.max_queue,
+                'active': self.active,
+                'queueDepth': self.waiting,
+                'peakQueueDepth': self.peak_waiting,
+                'admitted': self.admitted,
+                'fastPath': self.fast_path,
+                'shed': self.shed,
+                'queueTimeouts': self.timed_out,
+                'avgAnalysisSeconds': round(self.avg_seconds, 2)
+            }
+
+
+analysis_admission = AdmissionController()
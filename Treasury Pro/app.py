@@ -1,17 +1,77 @@
-from flask import Flask, render_template, jsonify, request
-from flask_cors import CORS
-import yfinance as yf
-import pandas as pd
 import time
-from datetime import datetime, timedelta
-import requests
+_import_started = time.perf_counter()
+
+from flask import Flask, Blueprint, Response, render_template, jsonify, request, send_from_directory, make_response, stream_with_context
+from flask_cors import CORS
+from datetime import datetime, timedelta, date
+from concurrent.futures import ThreadPoolExecutor
+import os
+import json
+import math
+import queue
+import threading
+import lazy
+import market_data
+import offload
+import portfolio
+import profiling
+import snapshots
+import statements
+import valuation
+import watchlist
+from admission import Overloaded, analysis_admission
+from offload import OffloadTimeout, offload_pool
+from cache import MISS, Fallback, cached, shared_cache
+from lazy import lazy_import
+from news import news_hub
+from events import events_index, to_ical
+from macro_store import macro_store
+from statements import statement_table
+from quotes import STREAM_SECONDS, quote_hub
+from profiling import stage
+
+# Heavy dependencies load on first real use (see lazy.py)
+yf = lazy_import('yfinance')
+pd = lazy_import('pandas')
+requests = lazy_import('requests')
+
+# Countries shown in the economic indicators panel (World Bank ISO2 codes)
+WORLD_BANK_COUNTRIES = {
+    'United States': 'US',
+    'China': 'CN',
+    'Japan': 'JP',
+    'Germany': 'DE',
+    'United Kingdom': 'GB',
+    'France': 'FR',
+    'India': 'IN'
+}
+
+# ISO3 codes for the same countries; bulk CSV dumps only carry ISO3
+WORLD_BANK_ISO3 = {'US': 'USA', 'CN': 'CHN', 'JP': 'JPN', 'DE': 'DEU', 'GB': 'GBR', 'FR': 'FRA', 'IN': 'IND'}
 
-app = Flask(__name__)
-CORS(app)
+# World Bank indicators - using uppercase keys to match frontend
+WORLD_BANK_INDICATORS = {
+    'GDP': 'NY.GDP.MKTP.CD',           # GDP (current US$)
+    'CPI': 'FP.CPI.TOTL.ZG',           # Inflation, consumer prices (annual %)
+    'Unemployment': 'SL.UEM.TOTL.ZS',  # Unemployment, total (% of labor force)
+    'Trade': 'NE.TRD.GNFS.ZS',         # Trade (% of GDP)
+    'Debt': 'GC.DOD.TOTL.GD.ZS'        # Government debt (% of GDP)
+}
+
+# Cache lifetimes (seconds)
+STOCK_TTL = 15 * 60
+RATES_TTL = 60 * 60
+MACRO_TTL = 12 * 60 * 60
+TARIFF_TTL = 6 * 60 * 60
+
+# /api/news: tickers per request, and how many never-seen ones it polls upstream
+MAX_NEWS_TICKERS = 50
+NEW_NEWS_TICKERS = 5
 
 def search_web(query):
     """Use Anthropic API with web search to get real-time information"""
     try:
+        market_data.throttle()
         response = requests.post(
             "https://api.anthropic.com/v1/messages",
             headers={
@@ -36,8 +96,38 @@ def search_web(query):
         print(f"Web search error: {e}")
         return None
 
-def get_5year_trends(ticker_obj, ticker_symbol):
-    """Get 5-year historical trends with ANNUAL data"""
+TTM_STATE_TTL = 400 * 24 * 60 * 60
+
+def get_normalized_statements(ticker_symbol, frequency='annual'):
+    """Statements mapped to canonical line items (see statements.py).
+
+    frequency is 'annual', 'quarterly' or 'ttm' (trailing twelve months,
+    rolled forward from the quarterly statements).
+    """
+    if frequency == 'ttm':
+        return get_ttm_statements(ticker_symbol)
+    with stage('statements'):
+        raw = market_data.get_statements(ticker_symbol, frequency)
+    with stage('normalize'):
+        normalized = statements.normalize(raw)
+        statement_table.upsert(ticker_symbol, normalized, frequency)
+    return normalized
+
+def get_ttm_statements(ticker_symbol):
+    """TTM canonical items; the rollup state lives in the shared cache so every worker extends the same history"""
+    quarterly = get_normalized_statements(ticker_symbol, 'quarterly')
+    key = f"ttm:{ticker_symbol.upper()}"
+    with stage('ttm'):
+        state = shared_cache.get(key)
+        rollup = statements.TTMRollup.from_dict(None if state is MISS else state)
+        if rollup.update(quarterly) or state is MISS:
+            shared_cache.set(key, rollup.to_dict(), TTM_STATE_TTL)
+        ttm = rollup.frame()
+        statement_table.upsert(ticker_symbol, ttm, 'ttm')
+    return ttm
+
+def get_5year_trends(ticker_symbol, normalized=None, frequency='annual'):
+    """Get 5-year historical trends (annual), or the last 8 quarters for quarterly/ttm"""
     try:
         trends = {
             'freeCashFlow': [],
@@ -46,95 +136,55 @@ def get_5year_trends(ticker_obj, ticker_symbol):
             'revenue': []
         }
         
-        # Get ANNUAL cash flow data
-        try:
-            cashflow = ticker_obj.cashflow  # Annual data
-            if not cashflow.empty:
-                fcf_cols = [col for col in cashflow.columns][:5]  # Last 5 years
-                for date in fcf_cols:
-                    try:
-                        fcf_val = 0
-                        if 'Free Cash Flow' in cashflow.index:
-                            fcf_val = float(cashflow.loc['Free Cash Flow', date])
-                        elif 'Operating Cash Flow' in cashflow.index:
-                            ocf = float(cashflow.loc['Operating Cash Flow', date])
-                            capex = float(cashflow.loc['Capital Expenditure', date]) if 'Capital Expenditure' in cashflow.index else 0
-                            fcf_val = ocf + capex  # CapEx is negative
-                        
-                        if pd.notna(fcf_val) and fcf_val != 0:
-                            trends['freeCashFlow'].append({
-                                'date': date.strftime('%Y'),
-                                'value': fcf_val
-                            })
-                    except:
-                        continue
-        except Exception as e:
-            print(f"Annual FCF error: {e}")
+        if normalized is None:
+            normalized = get_normalized_statements(ticker_symbol, frequency)
+        limit = 5 if frequency == 'annual' else 8
         
-        # Get historical price data for P/E calculation (annual)
-        try:
-            hist = ticker_obj.history(period="5y")
-            info = ticker_obj.info
-            eps = info.get('trailingEps', 0)
-            
-            if not hist.empty and eps > 0:
-                # Group by year and calculate average
-                hist['Year'] = hist.index.year
-                for year in sorted(hist['Year'].unique()):
-                    year_data = hist[hist['Year'] == year]
-                    avg_price = year_data['Close'].mean()
-                    pe = avg_price / eps
-                    if pd.notna(pe) and pe > 0 and pe < 200:  # Filter outliers
-                        trends['peRatio'].append({
-                            'date': str(year),
-                            'value': float(pe)
-                        })
-        except Exception as e:
-            print(f"Annual P/E error: {e}")
+        # Free cash flow, debt and revenue for the most recent periods
+        for key, item in [('freeCashFlow', 'free_cash_flow'), ('debt', 'total_debt'), ('revenue', 'revenue')]:
+            for date, value in statements.series(normalized, item, limit=limit):
+                if key == 'freeCashFlow' and value == 0:
+                    continue
+                trends[key].append({
+                    'date': statements.period_label(date, frequency),
+                    'value': value
+                })
         
-        # Get ANNUAL balance sheet for debt
+        # Get historical price data for P/E calculation
         try:
-            balance_sheet = ticker_obj.balance_sheet  # Annual data
-            if not balance_sheet.empty:
-                debt_cols = [col for col in balance_sheet.columns][:5]
-                for date in debt_cols:
-                    try:
-                        debt_val = 0
-                        if 'Total Debt' in balance_sheet.index:
-                            debt_val = float(balance_sheet.loc['Total Debt', date])
-                        elif 'Long Term Debt' in balance_sheet.index:
-                            debt_val = float(balance_sheet.loc['Long Term Debt', date])
-                        
-                        if pd.notna(debt_val):
-                            trends['debt'].append({
-                                'date': date.strftime('%Y'),
-                                'value': debt_val
+            with stage('history'):
+                hist = market_data.get_history(ticker_symbol, "5y")
+                info = market_data.get_info(ticker_symbol)
+            
+            if frequency == 'annual':
+                eps = info.get('trailingEps', 0)
+                if not hist.empty and eps > 0:
+                    # Average price per year in one groupby pass
+                    yearly = hist['Close'].groupby(hist.index.year).mean()
+                    for year, avg_price in yearly.items():
+                        pe = avg_price / eps
+                        if pd.notna(pe) and pe > 0 and pe < 200:  # Filter outliers
+                            trends['peRatio'].append({
+                                'date': str(year),
+                                'value': float(pe)
                             })
-                    except:
-                        continue
-        except Exception as e:
-            print(f"Annual Debt error: {e}")
-        
-        # Get ANNUAL revenue
-        try:
-            financials = ticker_obj.financials  # Annual data
-            if not financials.empty:
-                rev_cols = [col for col in financials.columns][:5]
-                for date in rev_cols:
-                    try:
-                        rev_val = 0
-                        if 'Total Revenue' in financials.index:
-                            rev_val = float(financials.loc['Total Revenue', date])
-                        
-                        if pd.notna(rev_val):
-                            trends['revenue'].append({
-                                'date': date.strftime('%Y'),
-                                'value': rev_val
+            elif not hist.empty:
+                # Average price over each quarter / TTM EPS at that quarter's end
+                ttm = normalized if frequency == 'ttm' else get_normalized_statements(ticker_symbol, 'ttm')
+                closes = hist['Close']
+                if closes.index.tz is not None:
+                    closes = closes.tz_localize(None)
+                for date, eps in statements.series(ttm, 'diluted_eps', limit=limit):
+                    window = closes[(closes.index > date - pd.DateOffset(months=3)) & (closes.index <= date)]
+                    if eps > 0 and len(window):
+                        pe = window.mean() / eps
+                        if pd.notna(pe) and pe > 0 and pe < 200:
+                            trends['peRatio'].append({
+                                'date': statements.period_label(date, frequency),
+                                'value': float(pe)
                             })
-                    except:
-                        continue
         except Exception as e:
-            print(f"Annual Revenue error: {e}")
+            print(f"P/E trend error: {e}")
         
         # Reverse to show oldest first
         for key in trends:
@@ -168,6 +218,7 @@ def get_world_bank_interest_rates():
         for country_name, country_code in countries.items():
             try:
                 url = f'https://api.worldbank.org/v2/country/{country_code}/indicator/{indicator}?format=json&date=2020:2026&per_page=10'
+                market_data.throttle()
                 response = requests.get(url, timeout=10)
                 
                 if response.status_code == 200:
@@ -227,6 +278,7 @@ def get_trading_economics_inflation():
         print(f"Error getting inflation data: {e}")
         return {'data': [], 'source': 'Unable to fetch inflation data'}
 
+@cached('rates', RATES_TTL)
 def get_comprehensive_rates_data():
     """Get comprehensive interest rates and inflation data"""
     try:
@@ -291,13 +343,15 @@ def get_comprehensive_rates_data():
             'treasuryInfo': treasury_result if treasury_result else 'US Treasury yields'
         }
         
+        if not wb_rates and not cb_result and not treasury_result:
+            return Fallback(rates_info)  # nothing live came back; retry next time
         return rates_info
         
     except Exception as e:
         print(f"Error getting comprehensive rates: {e}")
         import traceback
         traceback.print_exc()
-        return {
+        return Fallback({
             'worldBankRates': [],
             'centralBankRates': [],
             'inflationRates': [],
@@ -305,134 +359,76 @@ def get_comprehensive_rates_data():
             'cbRatesInfo': 'Unable to fetch rates',
             'inflationInfo': 'Unable to fetch inflation',
             'treasuryInfo': 'Unable to fetch yields'
-        }
+        })
 
 def get_newsapi_company_news(ticker_symbol, company_name):
-    """Get latest company news from NewsAPI.ai and Yahoo Finance"""
+    """Get latest company news from the background news poller's buffer"""
     try:
-        import requests
-        news_items = []
-        
-        # Method 1: Try NewsAPI.ai with web search (since API key might not be available)
-        # Search for news using the company name
-        query_newsapi = f"Find the latest 10 news articles about {company_name} ({ticker_symbol}) from the past week using NewsAPI or other news aggregators. Include headline, source, and link for each article."
-        
-        print(f"Searching for {company_name} news via NewsAPI.ai...")
-        newsapi_result = search_web(query_newsapi)
-        
-        # Method 2: Yahoo Finance News (most reliable)
-        print(f"Fetching Yahoo Finance news for {ticker_symbol}...")
-        try:
-            stock = yf.Ticker(ticker_symbol)
-            yf_news = stock.news
-            
-            if yf_news and isinstance(yf_news, list) and len(yf_news) > 0:
-                print(f"Yahoo Finance returned {len(yf_news)} news items")
-                for item in yf_news[:12]:
-                    title = item.get('title', '')
-                    link = item.get('link', '')
-                    publisher = item.get('publisher', item.get('source', ''))
-                    publish_time = item.get('providerPublishTime', 0)
-                    
-                    # Filter out generic or short titles
-                    if title and len(title) > 15 and 'update' not in title.lower():
-                        news_items.append({
-                            'title': title,
-                            'link': link if link else f'https://finance.yahoo.com/quote/{ticker_symbol}/news',
-                            'publisher': publisher if publisher else 'Financial News',
-                            'time': publish_time,
-                            'source': 'Yahoo Finance'
-                        })
-                
-                print(f"Extracted {len(news_items)} valid news items from Yahoo Finance")
-        except Exception as e:
-            print(f"Yahoo Finance news error: {e}")
-        
-        # Method 3: Direct NewsAPI.ai API call (if you have API key)
-        # Uncomment and add your API key if available
-        """
-        try:
-            newsapi_key = "YOUR_NEWSAPI_KEY_HERE"  # Get free key from newsapi.ai
-            newsapi_url = f"https://newsapi.ai/api/v1/article/getArticles"
-            
-            params = {
-                'query': f'{company_name} {ticker_symbol}',
-                'articlesPage': 1,
-                'articlesCount': 10,
-                'articlesSortBy': 'date',
-                'apiKey': newsapi_key
-            }
-            
-            response = requests.get(newsapi_url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                # Process NewsAPI.ai response
-                # Add to news_items
-        except Exception as e:
-            print(f"NewsAPI.ai direct call error: {e}")
-        """
+        # Reads the per-ticker buffer; only a never-seen ticker triggers an upstream poll
+        news_hub.track(ticker_symbol)
+        news_items = news_hub.latest(ticker_symbol, limit=10)
         
         # If we have enough good news, return it
         if len(news_items) >= 5:
             return news_items[:10]
         
-        # Method 4: Fallback - create useful news links
+        # Fallback - pad with links to news pages (time 0 renders as "Recently")
         print("Using fallback news links...")
         fallback_items = [
             {
                 'title': f'{company_name} - Latest Financial News and Market Updates',
                 'link': f'https://finance.yahoo.com/quote/{ticker_symbol}/news',
                 'publisher': 'Yahoo Finance',
-                'time': int(time.time()),
+                'time': 0,
                 'source': 'Direct Link'
             },
             {
                 'title': f'{company_name} Stock News, Analysis and Earnings Reports',
                 'link': f'https://www.marketwatch.com/investing/stock/{ticker_symbol.lower()}',
                 'publisher': 'MarketWatch',
-                'time': int(time.time()),
+                'time': 0,
                 'source': 'Direct Link'
             },
             {
                 'title': f'{company_name} Company Updates and Press Releases',
                 'link': f'https://seekingalpha.com/symbol/{ticker_symbol}/news',
                 'publisher': 'Seeking Alpha',
-                'time': int(time.time()),
+                'time': 0,
                 'source': 'Direct Link'
             },
             {
                 'title': f'{company_name} Business News and Market Coverage',
                 'link': f'https://www.reuters.com/companies/{ticker_symbol}.O',
                 'publisher': 'Reuters',
-                'time': int(time.time()),
+                'time': 0,
                 'source': 'Direct Link'
             },
             {
                 'title': f'{company_name} Financial Analysis and Stock Performance',
                 'link': f'https://www.bloomberg.com/quote/{ticker_symbol}:US',
                 'publisher': 'Bloomberg',
-                'time': int(time.time()),
+                'time': 0,
                 'source': 'Direct Link'
             },
             {
                 'title': f'{company_name} Earnings and Financial Results',
                 'link': f'https://www.cnbc.com/quotes/{ticker_symbol}',
                 'publisher': 'CNBC',
-                'time': int(time.time()),
+                'time': 0,
                 'source': 'Direct Link'
             },
             {
                 'title': f'{company_name} Market Data and Real-time Updates',
                 'link': f'https://www.google.com/finance/quote/{ticker_symbol}:NASDAQ',
                 'publisher': 'Google Finance',
-                'time': int(time.time()),
+                'time': 0,
                 'source': 'Direct Link'
             },
             {
                 'title': f'{company_name} Investment Research and Ratings',
                 'link': f'https://www.fool.com/quote/{ticker_symbol.lower()}',
                 'publisher': 'Motley Fool',
-                'time': int(time.time()),
+                'time': 0,
                 'source': 'Direct Link'
             }
         ]
@@ -450,30 +446,21 @@ def get_newsapi_company_news(ticker_symbol, company_name):
         traceback.print_exc()
         return []
 
+@cached('world_bank_indicators', MACRO_TTL)
 def get_world_bank_economic_indicators():
     """Fetch GDP, CPI, Unemployment, Trade, Government Debt from World Bank API"""
     try:
         import requests
         
+        # Serve from the local indicator store when it has been imported
+        if all(macro_store.has(code) for code in WORLD_BANK_INDICATORS.values()):
+            return get_stored_economic_indicators()
+        
         # Countries to fetch data for
-        countries = {
-            'United States': 'US',
-            'China': 'CN',
-            'Japan': 'JP',
-            'Germany': 'DE',
-            'United Kingdom': 'GB',
-            'France': 'FR',
-            'India': 'IN'
-        }
+        countries = WORLD_BANK_COUNTRIES
         
         # World Bank indicators - using uppercase keys to match frontend
-        indicators = {
-            'GDP': 'NY.GDP.MKTP.CD',           # GDP (current US$)
-            'CPI': 'FP.CPI.TOTL.ZG',           # Inflation, consumer prices (annual %)
-            'Unemployment': 'SL.UEM.TOTL.ZS',  # Unemployment, total (% of labor force)
-            'Trade': 'NE.TRD.GNFS.ZS',         # Trade (% of GDP)
-            'Debt': 'GC.DOD.TOTL.GD.ZS'        # Government debt (% of GDP)
-        }
+        indicators = WORLD_BANK_INDICATORS
         
         economic_data = {}
         
@@ -484,6 +471,7 @@ def get_world_bank_economic_indicators():
             for country_name, country_code in countries.items():
                 try:
                     url = f'https://api.worldbank.org/v2/country/{country_code}/indicator/{indicator_code}?format=json&date=2018:2024&per_page=20'
+                    market_data.throttle()
                     response = requests.get(url, timeout=15)
                     
                     if response.status_code == 200:
@@ -495,11 +483,7 @@ def get_world_bank_economic_indicators():
                                     value = entry['value']
                                     year = entry['date']
                                     
-                                    # Format based on indicator type
-                                    if indicator_name == 'GDP':
-                                        formatted_value = f"${value/1e12:.2f}T" if value >= 1e12 else f"${value/1e9:.2f}B"
-                                    else:
-                                        formatted_value = f"{value:.2f}%"
+                                    formatted_value = format_indicator_value(indicator_name, value)
                                     
                                     indicator_data.append({
                                         'country': country_name,
@@ -524,20 +508,48 @@ def get_world_bank_economic_indicators():
             print(f"Total {len(indicator_data)} countries fetched for {indicator_name}")
         
         print(f"World Bank data fetch complete")
+        if not any(economic_data.values()):
+            return Fallback(economic_data)  # every request failed; retry next time
         return economic_data
         
     except Exception as e:
         print(f"Error fetching World Bank economic indicators: {e}")
         import traceback
         traceback.print_exc()
-        return {
+        return Fallback({
             'GDP': [],
             'CPI': [],
             'Unemployment': [],
             'Trade': [],
             'Debt': []
-        }
+        })
 
+def format_indicator_value(indicator_name, value):
+    """Format based on indicator type"""
+    if indicator_name == 'GDP':
+        return f"${value/1e12:.2f}T" if value >= 1e12 else f"${value/1e9:.2f}B"
+    return f"{value:.2f}%"
+
+def get_stored_economic_indicators():
+    """Latest value per country for each dashboard indicator, from the local macro store"""
+    economic_data = {}
+    for indicator_name, indicator_code in WORLD_BANK_INDICATORS.items():
+        latest = macro_store.latest(indicator_code, list(WORLD_BANK_ISO3.values()))
+        indicator_data = []
+        for country_name, country_code in WORLD_BANK_COUNTRIES.items():
+            iso3 = WORLD_BANK_ISO3[country_code]
+            if iso3 in latest:
+                year, value = latest[iso3]
+                indicator_data.append({
+                    'country': country_name,
+                    'value': format_indicator_value(indicator_name, value),
+                    'rawValue': value,
+                    'year': str(year)
+                })
+        economic_data[indicator_name] = indicator_data
+    return economic_data
+
+@cached('tariff_news', TARIFF_TTL)
 def get_tariff_news(company_name, industry, ticker_symbol):
     """Get recent tariff news specifically relevant to the company"""
     query = f"Search for the latest tariff news and trade restrictions specifically affecting {company_name} ({ticker_symbol}) in 2025-2026. Include only news directly related to {company_name}'s operations, products, or supply chain. Mention specific tariff rates, countries affected, and direct impact on the company."
@@ -547,6 +559,7 @@ def get_tariff_news(company_name, industry, ticker_symbol):
         return result
     return f"No recent tariff announcements directly affecting {company_name} operations. Monitor trade policy updates for potential future impact."
 
+@cached('fed_data', RATES_TTL)
 def get_fed_economic_data():
     """Get latest economic data from FRED and Fed news"""
     try:
@@ -568,15 +581,17 @@ def get_fed_economic_data():
         
         economic_data['fedNews'] = fed_news if fed_news else 'Monitor Federal Reserve website for latest policy announcements.'
         
+        if not result and not fed_news:
+            return Fallback(economic_data)  # both searches failed; retry next time
         return economic_data
     except Exception as e:
         print(f"Error getting Fed data: {e}")
-        return {
+        return Fallback({
             'fedFundsRate': 'Data unavailable',
             'inflationRate': 'Data unavailable',
             'rateInfo': 'Unable to fetch current rates',
             'fedNews': 'Check Federal Reserve website for latest updates'
-        }
+        })
 
 def get_earnings_transcripts_link(ticker_symbol, company_name):
     """Get actual earnings call transcript sources"""
@@ -594,63 +609,19 @@ def get_earnings_transcripts_link(ticker_symbol, company_name):
     }
 
 def get_upcoming_events(ticker_obj, ticker_symbol, company_name):
-    """Get detailed upcoming events"""
+    """Get upcoming earnings and dividend events from the events index"""
     try:
-        events = []
-        
-        # Get earnings dates
-        try:
-            calendar = ticker_obj.calendar
-            if calendar is not None:
-                if 'Earnings Date' in calendar.index:
-                    earnings_dates = calendar.loc['Earnings Date']
-                    if isinstance(earnings_dates, pd.Series):
-                        for date in earnings_dates:
-                            if pd.notna(date):
-                                events.append({
-                                    'type': 'Earnings Call',
-                                    'date': str(date).split()[0],
-                                    'description': f'{company_name} Quarterly Earnings Report and Conference Call'
-                                })
-                    elif pd.notna(earnings_dates):
-                        events.append({
-                            'type': 'Earnings Call',
-                            'date': str(earnings_dates).split()[0],
-                            'description': f'{company_name} Quarterly Earnings Report and Conference Call'
-                        })
-                
-                if 'Ex-Dividend Date' in calendar.index:
-                    ex_div = calendar.loc['Ex-Dividend Date']
-                    if pd.notna(ex_div):
-                        events.append({
-                            'type': 'Ex-Dividend Date',
-                            'date': str(ex_div).split()[0],
-                            'description': 'Last date to purchase shares to receive upcoming dividend'
-                        })
-        except Exception as e:
-            print(f"Calendar error: {e}")
-        
-        # Search for additional events
-        query = f"Search for upcoming {company_name} ({ticker_symbol}) shareholder meetings, AGM, investor events, product launches, or major announcements scheduled for 2026."
-        additional_events = search_web(query)
-        
-        if additional_events:
-            # Parse and add additional events if found
-            if "AGM" in additional_events or "annual general meeting" in additional_events.lower():
-                events.append({
-                    'type': 'Annual General Meeting',
-                    'date': 'TBA 2026',
-                    'description': additional_events[:200] + "..."
-                })
-        
-        return events
+        # Only a ticker the index has never seen triggers an upstream calendar read
+        events_index.track(ticker_symbol, company_name, ticker_obj)
+        return events_index.for_ticker(ticker_symbol)
     except Exception as e:
         print(f"Error getting events: {e}")
         return []
 
-def identify_red_flags(info, trends):
+def identify_red_flags(info, trends, frequency='annual'):
     """Identify potential red flags in the company's financials"""
     red_flags = []
+    periods = {'annual': 'fiscal years', 'quarterly': 'quarters', 'ttm': 'trailing-twelve-month periods'}[frequency]
     
     # High debt-to-equity
     debt_to_equity = info.get('debtToEquity', 0) / 100 if info.get('debtToEquity') else 0
@@ -687,7 +658,7 @@ def identify_red_flags(info, trends):
             red_flags.append({
                 'severity': 'high',
                 'category': 'Revenue',
-                'message': f'Revenue declining trend ({pct_decline:.1f}%) over recent quarters'
+                'message': f'Revenue declining trend ({pct_decline:.1f}%) over the last {len(recent_revenue)} {periods}'
             })
     
     # Increasing debt trend
@@ -698,7 +669,7 @@ def identify_red_flags(info, trends):
             red_flags.append({
                 'severity': 'medium',
                 'category': 'Debt',
-                'message': f'Debt increasing significantly ({pct_increase:.1f}%) over recent quarters'
+                'message': f'Debt increasing significantly ({pct_increase:.1f}%) over the last {len(recent_debt)} {periods}'
             })
     
     # Negative net income
@@ -749,8 +720,7 @@ def get_peer_comparison(ticker, info):
         
         for peer_ticker in peers:
             try:
-                peer = yf.Ticker(peer_ticker)
-                peer_info = peer.info
+                peer_info = market_data.get_info(peer_ticker)
                 peer_data.append({
                     'symbol': peer_ticker,
                     'name': peer_info.get('shortName', peer_ticker),
@@ -781,42 +751,34 @@ def get_peer_comparison(ticker, info):
         print(f"Error getting peer comparison: {e}")
         return {'peers': [], 'sector': '', 'industry': ''}
 
+@cached('stock', STOCK_TTL)
 def fetch_financial_data(ticker):
     """Fetch comprehensive financial data"""
     try:
         stock = yf.Ticker(ticker)
-        info = stock.info
+        with stage('info'):
+            info = market_data.get_info(ticker)
         
         # Get historical data for Sharpe ratio
-        hist = stock.history(period="3y")
-        
-        if len(hist) > 0:
-            returns = hist['Close'].pct_change().dropna()
-            avg_return = returns.mean() * 252 * 100
-            std_dev = returns.std() * (252 ** 0.5) * 100
-        else:
-            avg_return = 0
-            std_dev = 1
+        with stage('sharpe'):
+            hist = market_data.get_history(ticker, "3y")
+            
+            if len(hist) > 0:
+                returns = hist['Close'].pct_change().dropna()
+                avg_return = returns.mean() * 252 * 100
+                std_dev = returns.std() * (252 ** 0.5) * 100
+            else:
+                avg_return = 0
+                std_dev = 1
         
         risk_free_rate = 4.5
         sharpe_ratio = (avg_return - risk_free_rate) / std_dev if std_dev > 0 else 0
         
-        # Get balance sheet safely
-        balance_sheet = stock.balance_sheet
-        try:
-            total_assets = balance_sheet.loc['Total Assets'].iloc[0] if 'Total Assets' in balance_sheet.index else info.get('totalAssets', 0)
-        except:
-            total_assets = info.get('totalAssets', 0)
-            
-        try:
-            total_liabilities = balance_sheet.loc['Total Liabilities Net Minority Interest'].iloc[0] if 'Total Liabilities Net Minority Interest' in balance_sheet.index else 0
-        except:
-            total_liabilities = 0
-            
-        try:
-            shareholders_equity = balance_sheet.loc['Stockholders Equity'].iloc[0] if 'Stockholders Equity' in balance_sheet.index else info.get('totalStockholderEquity', 0)
-        except:
-            shareholders_equity = info.get('totalStockholderEquity', 0)
+        # Balance sheet items from the canonical statements
+        normalized = get_normalized_statements(ticker)
+        total_assets = statements.latest(normalized, 'total_assets', info.get('totalAssets', 0))
+        total_liabilities = statements.latest(normalized, 'total_liabilities', 0)
+        shareholders_equity = statements.latest(normalized, 'stockholders_equity', info.get('totalStockholderEquity', 0))
         
         # Calculate ratios
         revenue = info.get('totalRevenue', 0)
@@ -834,18 +796,26 @@ def fetch_financial_data(ticker):
         sector = info.get('sector', 'N/A')
         
         # Get comprehensive data
-        trends = get_5year_trends(stock, ticker)
+        with stage('trends'):
+            trends = get_5year_trends(ticker, normalized)
         red_flags = identify_red_flags(info, trends)
-        peer_comparison = get_peer_comparison(ticker, info)
+        with stage('peers'):
+            peer_comparison = get_peer_comparison(ticker, info)
         
         # Get web-based information
-        tariff_info = get_tariff_news(company_name, industry, ticker)
-        economic_indicators = get_world_bank_economic_indicators()
-        fed_economic_data = get_fed_economic_data()
-        comprehensive_rates = get_comprehensive_rates_data()
+        with stage('tariff_news'):
+            tariff_info = get_tariff_news(company_name, industry, ticker)
+        with stage('world_bank'):
+            economic_indicators = get_world_bank_economic_indicators()
+        with stage('fed_data'):
+            fed_economic_data = get_fed_economic_data()
+        with stage('rates'):
+            comprehensive_rates = get_comprehensive_rates_data()
         transcript_links = get_earnings_transcripts_link(ticker, company_name)
-        events = get_upcoming_events(stock, ticker, company_name)
-        company_news = get_newsapi_company_news(ticker, company_name)
+        with stage('events'):
+            events = get_upcoming_events(stock, ticker, company_name)
+        with stage('news'):
+            company_news = get_newsapi_company_news(ticker, company_name)
         
         # Build response
         financial_data = {
@@ -906,93 +876,516 @@ def fetch_financial_data(ticker):
         traceback.print_exc()
         return None
 
-@app.route('/')
+def get_valuation_inputs(ticker, rates=None):
+    """DCF inputs from cached statements, info and rates data (see valuation.py)"""
+    normalized = get_normalized_statements(ticker)
+    info = market_data.get_info(ticker)
+    if rates is None:
+        with stage('rates'):
+            rates = get_comprehensive_rates_data()
+    return valuation.build_inputs(ticker, normalized, info, rates)
+
+def valuation_inputs_cold(tickers):
+    """True if loading DCF inputs for ``tickers`` needs any upstream call"""
+    return get_comprehensive_rates_data.peek() is MISS or any(
+        market_data.get_info.peek(t) is MISS or not market_data.statements_cached(t) for t in tickers
+    )
+
+def get_valuation_batch(tickers):
+    """(inputs for each ticker that loaded, {ticker: error}); tickers load in parallel"""
+    with stage('rates'):
+        rates = get_comprehensive_rates_data()
+    
+    def load(ticker):
+        try:
+            return ticker, get_valuation_inputs(ticker, rates)
+        except Exception as e:
+            print(f"Error loading valuation inputs for {ticker}: {e}")
+            return ticker, None
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        loaded = list(executor.map(load, tickers))
+    batch = [inputs for _, inputs in loaded if inputs is not None]
+    errors = {ticker: 'Failed to fetch data' for ticker, inputs in loaded if inputs is None}
+    return batch, errors
+
+def run_admitted(cold, work):
+    """work() through admission control when it will call upstream, else on the fast path"""
+    if cold:
+        with analysis_admission.admit():
+            return work()
+    analysis_admission.record_fast_path()
+    return work()
+
+def get_portfolio_prices(tickers, period='3y'):
+    """{ticker: daily Close series} from the cached price histories"""
+    def load(ticker):
+        try:
+            return ticker, market_data.get_history(ticker, period)['Close']
+        except Exception as e:
+            print(f"Error loading history for {ticker}: {e}")
+            return ticker, None
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        return dict(executor.map(load, tickers))
+
+def get_trends_and_flags(ticker, frequency):
+    """Trends and red flags for one statement frequency ('annual', 'quarterly' or 'ttm').
+
+    Goes through admission control when the info or statements must be fetched.
+    """
+    def work():
+        info = market_data.get_info(ticker)
+        with stage('trends'):
+            trends = get_5year_trends(ticker, frequency=frequency)
+        return trends, identify_red_flags(info, trends, frequency)
+    cold = market_data.get_info.peek(ticker) is MISS or not market_data.statements_cached(
+        ticker, 'annual' if frequency == 'annual' else 'quarterly'
+    )
+    return run_admitted(cold, work)
+
+def busy_response(e):
+    """503 + Retry-After for work shed by admission control or the offload pool"""
+    response = jsonify({'error': 'Server is busy, please retry shortly', 'retryAfter': e.retry_after})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 503
+
+bp = Blueprint('dashboard', __name__)
+
+@bp.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/api/stock/<ticker>')
+@bp.route('/api/stock/<ticker>')
 def get_stock_data(ticker):
-    data = fetch_financial_data(ticker.upper())
-    if data:
-        return jsonify(data)
-    else:
+    ticker = ticker.upper()
+    # Validate before spending an admission slot on a cold analysis
+    frequency = request.args.get('frequency', 'annual')
+    if frequency not in statements.FREQUENCIES:
+        return jsonify({'error': f'Unknown frequency {frequency}', 'frequencies': list(statements.FREQUENCIES)}), 400
+    with stage('fetch'):
+        # Cache hits are always served; only cold analyses go through admission control
+        data = fetch_financial_data.peek(ticker)
+        if data is MISS:
+            try:
+                with analysis_admission.admit():
+                    data = fetch_financial_data(ticker)
+            except Overloaded as e:
+                return busy_response(e)
+        else:
+            analysis_admission.record_fast_path()
+    if not data:
         return jsonify({"error": "Failed to fetch data"}), 500
+    # The cached analysis is annual; other frequencies swap in their own trends and red flags
+    if frequency != 'annual':
+        try:
+            trends, red_flags = get_trends_and_flags(ticker, frequency)
+        except Overloaded as e:
+            return busy_response(e)
+        except Exception as e:
+            print(f"Error getting {frequency} trends for {ticker}: {e}")
+            return jsonify({'error': 'Failed to fetch data'}), 500
+        data = dict(data, trends=trends, redFlags=red_flags)
+    data = dict(data, frequency=frequency)
+    # Newer price from the live quote hub, if anyone is streaming this ticker
+    live = quote_hub.quote(ticker)
+    if live:
+        data.update(price=live['price'], change=live['change'], changePercent=live['changePercent'])
+    with stage('serialize'):
+        # ?since=<version> returns only the sections that changed since that version
+        payload = snapshots.respond(ticker, data, request.args.get('since'))
+        response = jsonify(payload)
+        response.set_etag(payload['version'])
+        return response.make_conditional(request)
+
+@bp.route('/api/stock/<ticker>/trends')
+def get_stock_trends(ticker):
+    """Trends and red flags only: /api/stock/AAPL/trends?frequency=annual|quarterly|ttm"""
+    ticker = ticker.upper()
+    frequency = request.args.get('frequency', 'annual')
+    if frequency not in statements.FREQUENCIES:
+        return jsonify({'error': f'Unknown frequency {frequency}', 'frequencies': list(statements.FREQUENCIES)}), 400
+    try:
+        trends, red_flags = get_trends_and_flags(ticker, frequency)
+    except Overloaded as e:
+        return busy_response(e)
+    except Exception as e:
+        print(f"Error getting {frequency} trends for {ticker}: {e}")
+        return jsonify({'error': 'Failed to fetch data'}), 500
+    return jsonify({'symbol': ticker, 'frequency': frequency, 'trends': trends, 'redFlags': red_flags})
 
-@app.route('/api/health')
+@bp.route('/api/health')
 def health():
     return jsonify({"status": "healthy"})
 
-if __name__ == '__main__':
-    app.run(debug=True, port=5000)
+@bp.route('/api/metrics')
+def metrics():
+    """Load and cache metrics for this worker process"""
+    return jsonify({
+        'pid': os.getpid(),
+        'admission': analysis_admission.stats(),
+        'quotes': quote_hub.stats(),
+        'news': news_hub.stats(),
+        'events': events_index.stats(),
+        'portfolio': portfolio.engines.stats(),
+        'offload': offload_pool.stats(),
+        'cache': shared_cache.stats()
+    })
 
-@app.route('/')
-def index():
-    return render_template('index.html')
+@bp.route('/api/ready')
+def ready():
+    """Readiness probe: 200 once heavy modules are imported and caches are open"""
+    status = dict(_readiness)
+    status['modules'] = dict(lazy.load_times)
+    status['uptimeSeconds'] = round(time.time() - status['startedAt'], 1)
+    if status['ready']:
+        return jsonify(dict(status, status='ready'))
+    return jsonify(dict(status, status='starting')), 503
 
-@app.route('/api/stock/<ticker>')
-def get_stock_data(ticker):
-    data = fetch_financial_data(ticker.upper())
-    if data:
-        return jsonify(data)
+@bp.route('/api/news')
+def get_news():
+    """Merged news across tickers: /api/news?tickers=AAPL,MSFT&since=<unix>&limit=50"""
+    tickers = watchlist.parse(request.args.get('tickers'))[:MAX_NEWS_TICKERS]
+    invalid = [t for t in tickers if not watchlist.valid(t)]
+    if invalid:
+        return jsonify({'error': f"Invalid ticker symbols: {', '.join(invalid[:10])}"}), 400
+    since = request.args.get('since', 0, type=int)
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    # Tickers nobody has looked up yet are polled now (a few per request)
+    unseen = [t for t in tickers if news_hub.buffer(t) is None]
+    for ticker in unseen[:NEW_NEWS_TICKERS]:
+        news_hub.track(ticker)
+    items = news_hub.merged(tickers, limit=limit, since=since)
+    cursor = max((item['time'] for item in items), default=since)
+    return jsonify({'tickers': tickers, 'since': since, 'cursor': cursor, 'news': items})
+
+@bp.route('/api/calendar')
+def get_calendar():
+    """Events in a date range: /api/calendar?from=YYYY-MM-DD&to=YYYY-MM-DD&tickers=AAPL,MSFT&format=ics"""
+    try:
+        start = date.fromisoformat(request.args['from']) if request.args.get('from') else date.today()
+        end = date.fromisoformat(request.args['to']) if request.args.get('to') else start + timedelta(days=7)
+    except ValueError:
+        return jsonify({'error': 'from/to must be YYYY-MM-DD'}), 400
+    # Index keys are YYYY-MM-DD; fromisoformat also accepts forms like 20261019
+    start, end = start.isoformat(), end.isoformat()
+    tickers = watchlist.parse(request.args.get('tickers')) if request.args.get('tickers') else None
+    entries = events_index.range(start, end, tickers)
+    
+    if request.args.get('format') == 'ics':
+        response = make_response(to_ical(entries))
+        response.headers["Content-Disposition"] = f"attachment; filename=treasurypro_events_{start}_{end}.ics"
+        response.headers["Content-Type"] = "text/calendar; charset=utf-8"
+        return response
+    return jsonify({'from': start, 'to': end, 'count': len(entries), 'events': entries})
+
+@bp.route('/api/macro/series')
+def get_macro_series():
+    """Indicator history from the local store, no network calls.
+
+    /api/macro/series?indicator=GDP&countries=USA,CHN&from=2000&to=2023
+    /api/macro/series?indicator=NY.GDP.MKTP.CD&rank=2022&top=20&order=asc
+    """
+    if not macro_store.available:
+        return jsonify({'error': 'Macro store is empty; import World Bank dumps with macro_store.py'}), 503
+    indicator = request.args.get('indicator', 'GDP')
+    indicator = WORLD_BANK_INDICATORS.get(indicator, indicator)
+    if not macro_store.has(indicator):
+        return jsonify({'error': f'Indicator {indicator} not in store', 'available': macro_store.info()['indicators']}), 404
+    countries = [c.strip() for c in request.args.get('countries', '').split(',') if c.strip()] or None
+    
+    rank_year = request.args.get('rank', type=int)
+    if rank_year:
+        ranking = macro_store.ranking(
+            indicator, rank_year, countries,
+            top=request.args.get('top', 20, type=int),
+            ascending=request.args.get('order') == 'asc'
+        )
+        return jsonify({'indicator': indicator, 'year': rank_year, 'ranking': ranking})
+    
+    series = macro_store.series(
+        indicator, countries,
+        start=request.args.get('from', type=int),
+        end=request.args.get('to', type=int)
+    )
+    return jsonify({
+        'indicator': indicator,
+        'name': macro_store.meta['indicatorNames'].get(indicator),
+        'series': series
+    })
+
+@bp.route('/api/statements/cross-section')
+def get_statement_cross_section():
+    """One canonical line item across tickers.
+
+    /api/statements/cross-section?item=revenue&tickers=AAPL,MSFT&years=5&metric=growth
+    """
+    item = request.args.get('item', 'revenue')
+    if item not in statements.CANONICAL_ITEMS:
+        return jsonify({'error': f'Unknown item {item}', 'items': statements.ITEMS}), 400
+    tickers = watchlist.parse(request.args.get('tickers'))[:50]
+    years = min(request.args.get('years', 5, type=int), 20)
+    metric = request.args.get('metric', 'value')
+    
+    # Normalize any ticker not yet in this worker's table, in parallel, and
+    # through admission control when that means fetching statements
+    loaded = set(statement_table.tickers())
+    missing = [t for t in tickers if t not in loaded]
+    
+    def load(ticker):
+        try:
+            get_normalized_statements(ticker)
+        except Exception as e:
+            print(f"Error loading statements for {ticker}: {e}")
+    
+    def load_missing():
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(load, missing))
+    
+    if missing:
+        try:
+            run_admitted(not all(market_data.statements_cached(t) for t in missing), load_missing)
+        except Overloaded as e:
+            return busy_response(e)
+    
+    if metric == 'growth':
+        table = statement_table.growth(item, tickers, years)
     else:
-        return jsonify({"error": "Failed to fetch data"}), 500
+        table = statement_table.cross_section(item, tickers, years)
+    data = {
+        ticker: {period: (None if pd.isna(value) else float(value)) for period, value in row.items()}
+        for ticker, row in table.iterrows()
+    }
+    return jsonify({'item': item, 'metric': metric, 'periods': list(table.columns), 'data': data})
 
-@app.route('/api/health')
-def health():
-    return jsonify({"status": "healthy"})
+@bp.route('/api/quotes/stream')
+def stream_quotes():
+    """Server-Sent Events stream of live quotes: /api/quotes/stream?tickers=AAPL,MSFT
 
-if __name__ == '__main__':
-    app.run(debug=True, port=5000)
+    Sends the latest known quotes on connect, then only quotes that changed.
+    """
+    tickers = [t.strip().upper() for t in request.args.get('tickers', '').split(',') if t.strip()]
+    if not tickers:
+        return jsonify({'error': 'tickers is required'}), 400
+    invalid = [t for t in tickers if not watchlist.valid(t)]
+    if invalid:
+        return jsonify({'error': f"Invalid ticker symbols: {', '.join(invalid[:10])}"}), 400
+    try:
+        client = quote_hub.subscribe(tickers)
+    except Overloaded as e:
+        return busy_response(e)
+    
+    def events():
+        try:
+            yield 'retry: 5000\n\n'
+            # Ending the stream frees the thread; the browser reconnects, maybe to another worker
+            deadline = time.time() + STREAM_SECONDS
+            while time.time() < deadline:
+                try:
+                    message = client.queue.get(timeout=15)
+                except queue.Empty:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f"event: quote\ndata: {json.dumps(message)}\n\n"
+        finally:
+            quote_hub.unsubscribe(client)
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
-# Download endpoints for financials and interest rates
-from flask import make_response
-from io import BytesIO
+@bp.route('/api/stock/<ticker>/valuation')
+def get_stock_valuation(ticker):
+    """Monte Carlo DCF fair-value distribution: /api/stock/AAPL/valuation?scenarios=5000"""
+    ticker = ticker.upper()
+    scenarios = request.args.get('scenarios', valuation.SCENARIOS, type=int)
+    try:
+        inputs = run_admitted(valuation_inputs_cold([ticker]), lambda: get_valuation_inputs(ticker))
+    except Overloaded as e:
+        return busy_response(e)
+    except Exception as e:
+        print(f"Error loading valuation inputs for {ticker}: {e}")
+        return jsonify({'error': 'Failed to fetch data'}), 500
+    with stage('valuation'):
+        result = valuation.value(inputs, scenarios)
+    if 'error' in result:
+        return jsonify(result), 422
+    return jsonify(result)
+
+@bp.route('/api/valuation')
+def get_batch_valuation():
+    """Valuations for many tickers in one batched simulation (defaults to the watchlist)
+
+    /api/valuation?tickers=AAPL,MSFT&scenarios=5000
+    """
+    tickers = watchlist.parse(request.args.get('tickers'))[:100]
+    scenarios = request.args.get('scenarios', valuation.SCENARIOS, type=int)
+    try:
+        loading = time.perf_counter()
+        # One admission slot covers the whole batch's cold loads
+        batch, errors = run_admitted(valuation_inputs_cold(tickers), lambda: get_valuation_batch(tickers))
+        started = time.perf_counter()
+        with stage('valuation'):
+            results = valuation.value_many(batch, scenarios)
+    except Overloaded as e:
+        return busy_response(e)
+    except OffloadTimeout as e:
+        print(f"Batch valuation timed out: {e}")
+        return jsonify({'error': 'Valuation took too long, please try fewer tickers'}), 504
+    return jsonify({
+        'results': {r['symbol']: r for r in results},
+        'errors': errors,
+        'loadMs': round((started - loading) * 1000, 1),
+        'computeMs': round((time.perf_counter() - started) * 1000, 1)
+    })
+
+@bp.route('/api/portfolio/risk', methods=['GET', 'POST'])
+def get_portfolio_risk():
+    """Holdings-level volatility, correlation and risk contributions.
+
+    GET  /api/portfolio/risk?tickers=AAPL,MSFT,JPM&weights=0.5,0.3,0.2&estimator=ewma
+    POST /api/portfolio/risk  {"holdings": {"AAPL": 250000, "MSFT": 120000}, "estimator": "shrinkage"}
+    """
+    try:
+        if request.method == 'POST':
+            body = request.get_json(silent=True)
+            options = body if isinstance(body, dict) else {}
+            raw = options.get('holdings') or {}
+            if not isinstance(raw, dict):
+                return jsonify({'error': 'Holdings must be an object of ticker: position value'}), 400
+            holdings = {str(t).upper(): float(v) for t, v in raw.items()}
+        else:
+            tickers = watchlist.parse(request.args.get('tickers'))
+            weights = [float(w) for w in request.args.get('weights', '').split(',') if w.strip()]
+            if weights and len(weights) != len(tickers):
+                return jsonify({'error': 'weights must have one value per ticker'}), 400
+            holdings = dict(zip(tickers, weights or [1.0] * len(tickers)))
+            options = request.args
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Holdings and weights must be numbers'}), 400
+    if not all(math.isfinite(v) for v in holdings.values()):
+        return jsonify({'error': 'Holdings and weights must be finite numbers'}), 400
+    estimator = options.get('estimator', 'ewma')
+    if estimator not in portfolio.ESTIMATORS:
+        return jsonify({'error': f'Unknown estimator {estimator}', 'estimators': list(portfolio.ESTIMATORS)}), 400
+    if not 2 <= len(holdings) <= portfolio.MAX_POSITIONS:
+        return jsonify({'error': f'Portfolio needs 2 to {portfolio.MAX_POSITIONS} positions'}), 400
+    include_correlation = str(options.get('correlation', 'true')).lower() not in ('0', 'false', 'no')
+    
+    def build():
+        prices = get_portfolio_prices(list(holdings))
+        with stage('returns'):
+            returns, excluded = portfolio.returns_matrix(prices)
+        if returns.shape[1] < 2:
+            return None, excluded
+        with stage('covariance'):
+            engine = portfolio.engines.get(returns, estimator)
+            weights = portfolio.normalize_weights({t: holdings[t] for t in engine.tickers})
+            return portfolio.risk_report(engine, weights, include_correlation), excluded
+    
+    try:
+        # Price histories not yet cached mean one upstream call per ticker
+        cold = any(market_data.get_history.peek(t, '3y') is MISS for t in holdings)
+        report, excluded = run_admitted(cold, build)
+    except Overloaded as e:
+        return busy_response(e)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if report is None:
+        return jsonify({'error': 'Not enough price history for at least two positions', 'excluded': excluded}), 422
+    report['excluded'] = excluded
+    return jsonify(report)
+
+@bp.route('/api/profiles')
+def list_request_profiles():
+    """List recent request profiles (admin only)"""
+    if not profiling.is_admin(request):
+        return jsonify({'error': 'Forbidden'}), 403
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify({'profiles': profiling.list_profiles(limit=limit)})
+
+@bp.route('/api/profiles/<profile_id>')
+def get_request_profile(profile_id):
+    """Download a saved profile: collapsed stacks by default, ?format=json for stage timings"""
+    if not profiling.is_admin(request):
+        return jsonify({'error': 'Forbidden'}), 403
+    ext = '.json' if request.args.get('format') == 'json' else '.collapsed'
+    return send_from_directory(profiling.PROFILE_DIR, profile_id + ext, as_attachment=ext == '.collapsed')
+
+STATEMENT_SHEETS = {
+    'income': 'Income Statement',
+    'balance': 'Balance Sheet',
+    'cashflow': 'Cash Flow Statement'
+}
+
+def statement_export(ticker, statement_type, frequency='annual', canonical=False):
+    """A statement with one row per period, as the downloads export it; None when there's no data"""
+    if canonical or frequency == 'ttm':
+        normalized = get_normalized_statements(ticker, frequency)
+        df = statements.statement_frame(normalized, statement_type).dropna(how='all').dropna(axis=1, how='all')
+    elif frequency == 'quarterly':
+        df = market_data.get_statement(ticker, statement_type, frequency)
+    else:
+        df = market_data.get_statement(ticker, statement_type)
+    
+    if df is None or df.empty:
+        return None
+    
+    # Transpose so periods are in index
+    df = df.T
+    if frequency == 'annual':
+        df.index = df.index.strftime('%Y')
+        df.index.name = 'Year'
+    else:
+        df.index = df.index.strftime('%Y-%m-%d')
+        df.index.name = 'Quarter Ending' if frequency == 'quarterly' else 'TTM Ending'
+    return df
 
-@app.route('/download/financials/<ticker>')
+# Download endpoints for financials and interest rates
+@bp.route('/download/financials/<ticker>')
 def download_financials(ticker):
     """Download financial statements for specific selected years"""
     try:
         statement_type = request.args.get('type', 'income')
         years_param = request.args.get('years', '2024,2023,2022,2021,2020')
         file_format = request.args.get('format', 'xlsx')
+        # view=canonical exports the normalized line items instead of Yahoo's raw rows
+        canonical = request.args.get('view') == 'canonical'
+        # frequency=quarterly|ttm exports quarters; TTM only exists as canonical items
+        frequency = request.args.get('frequency', 'annual')
+        if frequency not in statements.FREQUENCIES:
+            return jsonify({'error': 'Invalid frequency'}), 400
+        canonical = canonical or frequency == 'ttm'
         
         # Parse selected years
         selected_years = [year.strip() for year in years_param.split(',')]
         
-        stock = yf.Ticker(ticker.upper())
-        
-        if statement_type == 'income':
-            df = stock.financials
-            sheet_name = 'Income Statement'
-        elif statement_type == 'balance':
-            df = stock.balance_sheet
-            sheet_name = 'Balance Sheet'
-        elif statement_type == 'cashflow':
-            df = stock.cashflow
-            sheet_name = 'Cash Flow Statement'
-        else:
+        if statement_type not in STATEMENT_SHEETS:
             return jsonify({'error': 'Invalid type'}), 400
+        sheet_name = STATEMENT_SHEETS[statement_type]
         
-        if df is None or df.empty:
+        df = statement_export(ticker.upper(), statement_type, frequency, canonical)
+        if df is None:
             return jsonify({'error': 'No data available'}), 404
-        
-        # Transpose so years are in index
-        df = df.T
-        df.index = df.index.strftime('%Y')
-        df.index.name = 'Year'
+        period_years = df.index.str[:4]
         
         # Filter for selected years (keep only years that exist in the data)
-        available_years = df.index.tolist()
+        available_years = set(period_years)
         years_to_include = [year for year in selected_years if year in available_years]
         
         if not years_to_include:
             return jsonify({'error': 'Selected years not available in data'}), 404
         
-        # Filter dataframe to selected years
-        df = df.loc[years_to_include]
+        # Filter dataframe to selected years (every quarter ending in them for quarterly/TTM)
+        if frequency == 'annual':
+            df = df.loc[years_to_include]
+        else:
+            df = df[period_years.isin(years_to_include)]
         
         # Create filename with years range
         year_range = f"{min(years_to_include)}-{max(years_to_include)}" if len(years_to_include) > 1 else years_to_include[0]
+        if frequency != 'annual':
+            year_range = f"{year_range}_{frequency}"
         
         if file_format == 'csv':
             output = df.to_csv()
@@ -1000,22 +1393,24 @@ def download_financials(ticker):
             response.headers["Content-Disposition"] = f"attachment; filename={ticker}_{statement_type}_{year_range}.csv"
             response.headers["Content-Type"] = "text/csv"
         else:
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name=sheet_name)
-            output.seek(0)
-            response = make_response(output.getvalue())
+            # Workbook rendering is CPU-bound; it runs in the offload process pool
+            response = make_response(offload.workbook([(sheet_name, df, True)]))
             response.headers["Content-Disposition"] = f"attachment; filename={ticker}_{statement_type}_{year_range}.xlsx"
             response.headers["Content-Type"] = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         
         return response
+    except Overloaded as e:
+        return busy_response(e)
+    except OffloadTimeout as e:
+        print(f"Download timed out: {e}")
+        return jsonify({'error': 'Export took too long, please try fewer years'}), 504
     except Exception as e:
         print(f"Download error: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
-@app.route('/download/rates')
+@bp.route('/download/rates')
 def download_rates():
     """Download interest rates data"""
     try:
@@ -1035,19 +1430,70 @@ def download_rates():
             response.headers["Content-Disposition"] = "attachment; filename=interest_rates.csv"
             response.headers["Content-Type"] = "text/csv"
         else:
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                if rates_data.get('treasuryYields'):
-                    pd.DataFrame(rates_data['treasuryYields']).to_excel(writer, sheet_name='Treasury', index=False)
-                if rates_data.get('centralBankRates'):
-                    pd.DataFrame(rates_data['centralBankRates']).to_excel(writer, sheet_name='Central Banks', index=False)
-                if rates_data.get('inflationRates'):
-                    pd.DataFrame(rates_data['inflationRates']).to_excel(writer, sheet_name='Inflation', index=False)
-            output.seek(0)
-            response = make_response(output.getvalue())
+            sheets = [
+                (sheet_name, rates_data[key], False)
+                for key, sheet_name in [('treasuryYields', 'Treasury'), ('centralBankRates', 'Central Banks'), ('inflationRates', 'Inflation')]
+                if rates_data.get(key)
+            ]
+            if not sheets:
+                return jsonify({'error': 'No rates data available'}), 404
+            response = make_response(offload.workbook(sheets))
             response.headers["Content-Disposition"] = "attachment; filename=interest_rates.xlsx"
             response.headers["Content-Type"] = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         
         return response
+    except Overloaded as e:
+        return busy_response(e)
+    except OffloadTimeout as e:
+        print(f"Rates download timed out: {e}")
+        return jsonify({'error': 'Export took too long'}), 504
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+_readiness = {
+    'ready': False,
+    'pid': os.getpid(),
+    'startedAt': time.time(),
+    'importMs': None,
+    'warmupMs': None,
+    'error': None
+}
+
+def warm_up():
+    """Import heavy modules and open the shared cache, then mark the process ready"""
+    started = time.perf_counter()
+    try:
+        lazy.load(pd, yf, requests)
+        shared_cache.stats()
+        _readiness['ready'] = True
+    except Exception as e:
+        print(f"Warm-up error: {e}")
+        _readiness['error'] = str(e)
+    _readiness['warmupMs'] = round((time.perf_counter() - started) * 1000, 1)
+
+def start_warm_up():
+    """Run warm_up() and the background pollers so the process can answer probes immediately"""
+    _readiness.update(ready=False, pid=os.getpid(), startedAt=time.time(), warmupMs=None, error=None)
+    threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+    # Background pollers also live per process
+    news_hub.start()
+    events_index.start()
+
+def create_app(warm=True):
+    """Application factory used by `python app.py`, `flask run` and wsgi.py
+
+    With warm=False the caller starts warm-up itself (gunicorn does it after
+    forking each worker, see gunicorn.conf.py).
+    """
+    app = Flask(__name__)
+    CORS(app)
+    profiling.init_app(app)
+    app.register_blueprint(bp)
+    if warm:
+        start_warm_up()
+    return app
+
+_readiness['importMs'] = round((time.perf_counter() - _import_started) * 1000, 1)
+
+if __name__ == '__main__':
+    create_app().run(debug=True, port=5000)
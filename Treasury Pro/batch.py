@@ -0,0 +1,165 @@
+"""Headless batch report generator for nightly runs.
+
+Builds a report pack per ticker without the web UI: the full analysis as
+JSON (what /api/stock/<ticker> serves) and the income, balance and cash
+flow statements as one XLSX workbook and one CSV per statement (what
+/download/financials/<ticker> exports). Files go to OUTPUT/<TICKER>/.
+
+Tickers run on a bounded thread pool and every upstream request draws from
+one rate budget, as in warmup.py. Each finished ticker is checkpointed in
+the output directory, so a run that is interrupted resumes where it stopped
+when started again with the same output directory and options.
+
+Usage:
+    python batch.py [--universe FILE ...] [--tickers AAPL,MSFT] [--output DIR]
+                    [--formats json,xlsx,csv] [--frequency annual|quarterly|ttm]
+                    [--canonical] [--workers 4] [--rate 5] [--refresh] [--fresh]
+
+The universe is read the same way as warmup.py. The output directory
+defaults to reports/<today> under TREASURYPRO_BATCH_DIR (./reports).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import date
+
+import market_data
+import offload
+import statements
+from ratelimit import TokenBucket
+from warmup import Checkpoint, build_universe, duration_stats, run_tickers, warm_ticker
+
+BATCH_DIR = os.environ.get('TREASURYPRO_BATCH_DIR', 'reports')
+FORMATS = ('json', 'xlsx', 'csv')
+CHECKPOINT_NAME = 'batch.checkpoint.json'
+
+
+def _write(path, data):
+    """Write bytes or text atomically, so a killed run never leaves a partial file"""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return len(data)
+
+
+def report_pack(app, ticker, output, formats=FORMATS, frequency='annual', canonical=False, refresh=False):
+    """Write one ticker's reports under output/<ticker>; returns {file name: bytes}"""
+    warm_ticker(app, ticker, refresh)
+    data = app.fetch_financial_data(ticker)
+    if data is None:
+        raise RuntimeError('analysis failed')
+
+    folder = os.path.join(output, ticker)
+    os.makedirs(folder, exist_ok=True)
+    files = {}
+
+    def save(name, content):
+        files[name] = _write(os.path.join(folder, name), content)
+
+    if 'json' in formats:
+        save(f"{ticker}_analysis.json", json.dumps(data, indent=2, default=str))
+
+    sheets = []
+    for statement_type, sheet_name in app.STATEMENT_SHEETS.items():
+        df = app.statement_export(ticker, statement_type, frequency, canonical)
+        if df is None:
+            continue
+        sheets.append((sheet_name, df, True))
+        if 'csv' in formats:
+            save(f"{ticker}_{statement_type}_{frequency}.csv", df.to_csv())
+    if sheets and 'xlsx' in formats:
+        # Same offload pool path as the download endpoint
+        save(f"{ticker}_financials_{frequency}.xlsx", offload.workbook(sheets))
+    if not sheets:
+        print(f"No statements available for {ticker}")
+    return files
+
+
+def run(tickers, output, formats=FORMATS, frequency='annual', canonical=False,
+        workers=4, rate=5.0, refresh=False, fresh=False):
+    """Generate report packs for ``tickers`` and return a throughput/failure summary"""
+    import app
+
+    started = time.perf_counter()
+    os.makedirs(output, exist_ok=True)
+    budget = TokenBucket(rate, burst=max(1, rate * 2))
+    market_data.upstream_budget = budget
+    # Every worker may render a workbook at once; queue them rather than shed
+    offload.offload_pool.max_queue = max(offload.offload_pool.max_queue, workers)
+
+    # Changing the formats or frequency starts a new run in the same directory
+    run_key = f"{frequency}:{'canonical' if canonical else 'reported'}:{','.join(formats)}"
+    checkpoint = Checkpoint(os.path.join(output, CHECKPOINT_NAME), fresh=fresh, run_key=run_key)
+    written, durations = run_tickers(
+        tickers, lambda t: report_pack(app, t, output, formats, frequency, canonical, refresh),
+        checkpoint, workers, 'Batch', outcome=sorted
+    )
+
+    duration = time.perf_counter() - started
+    summary = {
+        'output': os.path.abspath(output),
+        'tickers': len(tickers),
+        'written': len(written),
+        'resumed': sum(t in checkpoint.done for t in tickers) - len(written),
+        'failed': checkpoint.failed,
+        'coverage': round(sum(t in checkpoint.done for t in tickers) / len(tickers), 4) if tickers else 1.0,
+        'files': sum(len(files) for files in written.values()),
+        'megabytes': round(sum(sum(files.values()) for files in written.values()) / 1e6, 2),
+        'tickersPerMinute': round(len(written) / duration * 60, 1) if duration > 0 else None,
+        'tickerSeconds': duration_stats(durations),
+        'upstream': budget.stats(),
+        'offload': offload.offload_pool.stats(),
+        'durationSeconds': round(duration, 1)
+    }
+    market_data.upstream_budget = None
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate per-ticker JSON/XLSX/CSV report packs')
+    parser.add_argument('--universe', action='append',
+                        help='ticker list file (repeatable; default $TREASURYPRO_UNIVERSE)')
+    parser.add_argument('--tickers', help='extra comma-separated tickers')
+    parser.add_argument('--no-watchlist', action='store_true', help='skip the watchlist tickers')
+    parser.add_argument('--output', help='output directory (default reports/<today>)')
+    parser.add_argument('--formats', default=','.join(FORMATS), help='comma-separated subset of json,xlsx,csv')
+    parser.add_argument('--frequency', default='annual', choices=statements.FREQUENCIES)
+    parser.add_argument('--canonical', action='store_true',
+                        help='export normalized line items instead of the reported rows')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('TREASURYPRO_BATCH_WORKERS', '4')))
+    parser.add_argument('--rate', type=float, default=float(os.environ.get('TREASURYPRO_BATCH_RATE', '5')),
+                        help='upstream requests per second across all workers')
+    parser.add_argument('--refresh', action='store_true',
+                        help='refetch info, prices and the analysis even if still cached')
+    parser.add_argument('--fresh', action='store_true', help='ignore the checkpoint and rewrite every ticker')
+    parser.add_argument('--min-coverage', type=float, default=0.9,
+                        help='exit non-zero below this fraction of tickers written')
+    args = parser.parse_args(argv)
+
+    formats = tuple(f for f in FORMATS if f in {f.strip().lower() for f in args.formats.split(',')})
+    if not formats:
+        parser.error('--formats must include json, xlsx or csv')
+    paths = args.universe or [p for p in [os.environ.get('TREASURYPRO_UNIVERSE')] if p]
+    tickers = build_universe(paths, args.tickers, not args.no_watchlist)
+    if not tickers:
+        parser.error('no tickers to report on')
+    output = args.output or os.path.join(BATCH_DIR, date.today().isoformat())
+    print(f"Writing {','.join(formats)} reports for {len(tickers)} tickers to {output} "
+          f"with {args.workers} workers at {args.rate:g} upstream requests/s")
+
+    try:
+        summary = run(tickers, output, formats, args.frequency, args.canonical,
+                      args.workers, args.rate, args.refresh, args.fresh)
+    except KeyboardInterrupt:
+        return 130
+    print(json.dumps(summary, indent=2))
+    return 0 if summary['coverage'] >= args.min_coverage else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
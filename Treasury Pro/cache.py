@@ -0,0 +1,472 @@
+"""Cache shared across worker processes and nodes.
+
+The cache is two-tier: a small in-process LRU (L1) in front of a shared
+backend (L2) chosen with TREASURYPRO_CACHE_URL:
+
+- ``sqlite:///path/to/cache.db`` - SQLite in WAL mode, shared by the workers
+  on one machine (default when unset: TREASURYPRO_CACHE_PATH or
+  cache/treasurypro.db)
+- ``redis://host:6379/0``       - any Redis-protocol server, shared by all
+  nodes behind the load balancer (needs the ``redis`` package)
+- ``memory://``                 - in-process only, for development
+
+Values are stored in a compact binary format (see ``encode``): JSON for plain
+data and a columnar float64 layout for numeric DataFrames such as Yahoo
+statements and price history. Nothing is pickled, so a shared L2 never
+executes code on read.
+
+Backend connections are opened lazily per process (and per thread for
+SQLite), which keeps the cache safe to use with gunicorn's ``preload_app``.
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import socket
+import struct
+import sqlite3
+import threading
+import functools
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+from lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+CACHE_PATH = os.environ.get(
+    'TREASURYPRO_CACHE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'treasurypro.db')
+)
+# Unset means SQLite at CACHE_PATH
+CACHE_URL = os.environ.get('TREASURYPRO_CACHE_URL', '')
+L1_SIZE = int(os.environ.get('TREASURYPRO_CACHE_L1', '256'))       # entries, 0 disables
+L1_TTL = float(os.environ.get('TREASURYPRO_CACHE_L1_TTL', '60'))   # seconds
+
+# Sentinel so cached falsy values (empty lists, 0) still count as hits
+MISS = object()
+
+
+# --- Serialization -------------------------------------------------------
+
+TAG_JSON = b'J'
+TAG_FRAME = b'F'
+
+
+def _encode_labels(index):
+    if isinstance(index, pd.DatetimeIndex):
+        tz = str(index.tz) if index.tz is not None else None
+        values = index.tz_convert('UTC') if tz else index
+        unit = getattr(index, 'unit', 'ns')
+        return {'kind': 'datetime', 'tz': tz, 'unit': unit, 'values': values.asi8.tolist(), 'name': index.name}
+    return {'kind': 'labels', 'values': [v.item() if hasattr(v, 'item') else v for v in index], 'name': index.name}
+
+
+def _decode_labels(spec):
+    if spec['kind'] == 'datetime':
+        index = pd.DatetimeIndex(np.array(spec['values'], dtype='int64').astype(f"datetime64[{spec['unit']}]"))
+        if spec['tz']:
+            index = index.tz_localize('UTC').tz_convert(spec['tz'])
+        return index.rename(spec['name'])
+    return pd.Index(spec['values'], name=spec['name'])
+
+
+def encode(value):
+    """Serialize a JSON-compatible value or a numeric DataFrame to bytes"""
+    # A value can only be a DataFrame if pandas is loaded; don't import it to check
+    if 'pandas' in sys.modules and isinstance(value, pd.DataFrame):
+        numeric = value.apply(pd.to_numeric, errors='coerce')
+        header = json.dumps({
+            'index': _encode_labels(value.index),
+            'columns': _encode_labels(value.columns),
+            'dtypes': [str(t) for t in value.dtypes]
+        }).encode('utf-8')
+        body = numeric.to_numpy(dtype='float64').tobytes()
+        return TAG_FRAME + struct.pack('>I', len(header)) + header + zlib.compress(body, 1)
+    return TAG_JSON + zlib.compress(json.dumps(value).encode('utf-8'), 1)
+
+
+def decode(data):
+    tag, payload = data[:1], data[1:]
+    if tag == TAG_FRAME:
+        (length,) = struct.unpack('>I', payload[:4])
+        header = json.loads(payload[4:4 + length])
+        index = _decode_labels(header['index'])
+        columns = _decode_labels(header['columns'])
+        values = np.frombuffer(zlib.decompress(payload[4 + length:]), dtype='float64')
+        frame = pd.DataFrame(values.reshape(len(index), len(columns)), index=index, columns=columns)
+        for column, dtype in zip(columns, header['dtypes']):
+            if dtype != 'float64' and dtype != 'object':
+                try:
+                    frame[column] = frame[column].astype(dtype)
+                except (TypeError, ValueError):
+                    pass
+        return frame
+    if tag == TAG_JSON:
+        return json.loads(zlib.decompress(payload))
+    raise ValueError(f'Unknown cache value tag {tag!r}')
+
+
+# --- Backends --------------------------------------------------------------
+
+class MemoryCache:
+    """In-process LRU with per-entry expiry"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_bytes(self, key):
+        return self.get_entry(key)[0]
+
+    def get_entry(self, key):
+        """(bytes, expiry time) or (None, None)"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None, None
+            if entry[1] < time.time():
+                del self._data[key]
+                return None, None
+            self._data.move_to_end(key)
+            return entry
+
+    def set_bytes(self, key, data, ttl):
+        with self._lock:
+            self._data[key] = (data, time.time() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def add_bytes(self, key, data, ttl):
+        """Set only if the key is absent or expired; returns True if it was set"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] >= time.time():
+                return False
+        self.set_bytes(key, data, ttl)
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {'backend': 'memory', 'entries': len(self._data), 'maxEntries': self.max_entries}
+
+
+class SQLiteCache:
+    """TTL key/value cache backed by a SQLite database in WAL mode"""
+
+    PURGE_INTERVAL = 300  # seconds between sweeps of expired rows
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._last_purge = 0
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache_v2 ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)'
+        )
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def get_bytes(self, key):
+        return self.get_entry(key)[0]
+
+    def get_entry(self, key):
+        """(bytes, expiry time) or (None, None)"""
+        row = self._conn().execute(
+            'SELECT value, expires FROM cache_v2 WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None or row[1] < time.time():
+            return None, None
+        return bytes(row[0]), row[1]
+
+    def set_bytes(self, key, data, ttl):
+        self._conn().execute(
+            'INSERT OR REPLACE INTO cache_v2 (key, value, expires) VALUES (?, ?, ?)',
+            (key, sqlite3.Binary(data), time.time() + ttl)
+        )
+        self._purge_expired()
+
+    def add_bytes(self, key, data, ttl):
+        """Set only if the key is absent or expired; returns True if it was set"""
+        now = time.time()
+        cursor = self._conn().execute(
+            'INSERT INTO cache_v2 (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires = excluded.expires '
+            'WHERE cache_v2.expires < ?',
+            (key, sqlite3.Binary(data), now + ttl, now)
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, key):
+        self._conn().execute('DELETE FROM cache_v2 WHERE key = ?', (key,))
+
+    def clear(self):
+        self._conn().execute('DELETE FROM cache_v2')
+
+    def _purge_expired(self):
+        now = time.time()
+        if now - self._last_purge < self.PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        self._conn().execute('DELETE FROM cache_v2 WHERE expires < ?', (now,))
+
+    def stats(self):
+        conn = self._conn()
+        total = conn.execute('SELECT COUNT(*) FROM cache_v2').fetchone()[0]
+        live = conn.execute('SELECT COUNT(*) FROM cache_v2 WHERE expires >= ?', (time.time(),)).fetchone()[0]
+        return {'backend': 'sqlite', 'path': self.path, 'entries': total, 'live': live}
+
+
+class RedisCache:
+    """Cache on any Redis-protocol server (Redis, Valkey, KeyDB, ...)"""
+
+    def __init__(self, url, prefix='treasurypro:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("TREASURYPRO_CACHE_URL is a redis:// URL but the 'redis' package is not installed")
+        self.url = url
+        self.prefix = prefix
+        self._redis = redis
+        self._client = None
+        self._pid = None
+
+    def _conn(self):
+        # redis-py pools are not fork-safe; make a new one in each worker
+        if self._client is None or self._pid != os.getpid():
+            self._client = self._redis.Redis.from_url(self.url, socket_timeout=2, socket_connect_timeout=2)
+            self._pid = os.getpid()
+        return self._client
+
+    def get_bytes(self, key):
+        return self._conn().get(self.prefix + key)
+
+    def get_entry(self, key):
+        """(bytes, expiry time) or (None, None)"""
+        pipe = self._conn().pipeline(transaction=False)
+        pipe.get(self.prefix + key)
+        pipe.pttl(self.prefix + key)
+        data, pttl = pipe.execute()
+        if data is None:
+            return None, None
+        # pttl is -1 for a key without expiry
+        return data, time.time() + pttl / 1000 if pttl >= 0 else float('inf')
+
+    def set_bytes(self, key, data, ttl):
+        self._conn().set(self.prefix + key, data, ex=max(1, int(ttl)))
+
+    def add_bytes(self, key, data, ttl):
+        """Set only if the key is absent (SET NX); returns True if it was set"""
+        return bool(self._conn().set(self.prefix + key, data, ex=max(1, int(ttl)), nx=True))
+
+    def delete(self, key):
+        self._conn().delete(self.prefix + key)
+
+    def clear(self):
+        conn = self._conn()
+        for key in conn.scan_iter(match=self.prefix + '*', count=500):
+            conn.delete(key)
+
+    def stats(self):
+        info = self._conn().info('memory')
+        return {'backend': 'redis', 'host': urlsplit(self.url).hostname, 'usedMemory': info.get('used_memory_human')}
+
+
+def backend_from_url(url):
+    if not url:
+        return SQLiteCache(CACHE_PATH)
+    parts = urlsplit(url)
+    if parts.scheme == 'memory':
+        return MemoryCache()
+    if parts.scheme == 'sqlite':
+        return SQLiteCache(url[len('sqlite:///'):] or CACHE_PATH)
+    if parts.scheme in ('redis', 'rediss', 'unix'):
+        return RedisCache(url)
+    raise ValueError(f'Unsupported cache URL {url}')
+
+
+class TieredCache:
+    """Local L1 in front of a shared L2; values go in and come out decoded"""
+
+    def __init__(self, l2, l1=None, l1_ttl=L1_TTL):
+        self.l1 = l1
+        self.l2 = l2
+        self.l1_ttl = l1_ttl
+        self.hits = {'l1': 0, 'l2': 0, 'miss': 0}
+
+    def get(self, key, default=MISS, fresh=False):
+        """Cached value or ``default``; fresh=True skips L1 for state other processes update"""
+        if self.l1 is not None and not fresh:
+            data = self.l1.get_bytes(key)
+            if data is not None:
+                self.hits['l1'] += 1
+                return decode(data)
+        try:
+            data, expires = self.l2.get_entry(key)
+        except Exception as e:
+            print(f"Cache read error for {key}: {e}")
+            data = None
+        if data is None:
+            self.hits['miss'] += 1
+            return default
+        self.hits['l2'] += 1
+        if self.l1 is not None and not fresh:
+            # Never keep a copy in L1 past the entry's expiry in L2
+            self.l1.set_bytes(key, data, min(self.l1_ttl, expires - time.time()))
+        return decode(data)
+
+    def set(self, key, value, ttl):
+        try:
+            data = encode(value)
+        except (TypeError, ValueError) as e:
+            print(f"Cache encode error for {key}: {e}")
+            return
+        if self.l1 is not None:
+            # Short L1 lifetime bounds how stale one node can be vs the others
+            self.l1.set_bytes(key, data, min(ttl, self.l1_ttl))
+        try:
+            self.l2.set_bytes(key, data, ttl)
+        except Exception as e:
+            print(f"Cache write error for {key}: {e}")
+
+    def add(self, key, value, ttl):
+        """Set in L2 only if the key is absent or expired there; returns True if it was set"""
+        try:
+            return self.l2.add_bytes(key, encode(value), ttl)
+        except Exception as e:
+            print(f"Cache add error for {key}: {e}")
+            return False
+
+    def delete(self, key):
+        if self.l1 is not None:
+            self.l1.delete(key)
+        self.l2.delete(key)
+
+    def clear(self):
+        if self.l1 is not None:
+            self.l1.clear()
+        self.l2.clear()
+
+    def stats(self):
+        try:
+            l2 = self.l2.stats()
+        except Exception as e:
+            l2 = {'error': str(e)}
+        return {
+            'l1': self.l1.stats() if self.l1 is not None else None,
+            'l2': l2,
+            'hits': dict(self.hits)
+        }
+
+
+def make_cache(url=CACHE_URL, l1_size=L1_SIZE):
+    l1 = MemoryCache(l1_size) if l1_size > 0 else None
+    return TieredCache(backend_from_url(url), l1)
+
+
+shared_cache = make_cache()
+
+
+class Lease:
+    """Leadership of one background job among all processes sharing the cache.
+
+    Every process runs the job's loop, but only the lease holder does the
+    work. The holder renews the lease as it goes; if it dies, the lease
+    expires after ``ttl`` seconds and another process takes over.
+    """
+
+    def __init__(self, name, ttl):
+        self.key = f"lease:{name}"
+        self.ttl = ttl
+
+    @staticmethod
+    def owner():
+        # Evaluated on each call: the pid changes when gunicorn forks
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def acquire(self):
+        """Take or renew the lease; returns True if this process holds it"""
+        owner = self.owner()
+        if shared_cache.add(self.key, owner, self.ttl):
+            return True
+        if shared_cache.get(self.key, fresh=True) == owner:
+            shared_cache.set(self.key, owner, self.ttl)
+            return True
+        return False
+
+    def holder(self):
+        holder = shared_cache.get(self.key, fresh=True)
+        return None if holder is MISS else holder
+
+
+class Fallback:
+    """A result ``cached`` returns to the caller without storing it.
+
+    Fetchers that answer a failure with placeholder data return
+    ``Fallback(placeholder)`` so the next call retries instead of serving
+    the placeholder until the TTL runs out.
+    """
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+
+def cached(prefix, ttl):
+    """Cache a function's result in the shared cache.
+
+    The key is ``prefix`` plus the call arguments. ``None`` and Fallback
+    results are not cached, so a failed fetch is retried on the next call.
+    """
+    def make_key(args, kwargs):
+        parts = [prefix] + [str(a) for a in args] + [f"{k}={v}" for k, v in sorted(kwargs.items())]
+        return ':'.join(parts)
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_key(args, kwargs)
+            value = shared_cache.get(key)
+            if value is not MISS:
+                return value
+            value = func(*args, **kwargs)
+            if isinstance(value, Fallback):
+                return value.value
+            if value is not None:
+                shared_cache.set(key, value, ttl)
+            return value
+
+        def peek(*args, **kwargs):
+            """The cached result for these arguments, or MISS (never calls func)"""
+            return shared_cache.get(make_key(args, kwargs))
+
+        def invalidate(*args, **kwargs):
+            """Drop the cached result for these arguments"""
+            shared_cache.delete(make_key(args, kwargs))
+
+        wrapper.peek = peek
+        wrapper.invalidate = invalidate
+        return wrapper
+    return decorator
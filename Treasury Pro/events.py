@@ -0,0 +1,252 @@
+"""Corporate events calendar indexed across the watchlist.
+
+Earnings and dividend dates for every tracked ticker are refreshed in the
+background and kept in one date-sorted index, so date-range queries over the
+whole book are two bisects instead of one upstream call per ticker.
+
+Per-ticker events and the index live in the shared cache, so every worker
+process answers /api/calendar the same way; each process keeps a decoded
+copy of the index for SNAPSHOT_SECONDS. Only the holder of the
+``events-refresh`` lease runs the background refresh.
+"""
+import os
+import time
+import bisect
+import threading
+from datetime import date, datetime, timezone
+
+import market_data
+import watchlist
+from cache import Lease, MISS, shared_cache
+from lazy import lazy_import
+
+yf = lazy_import('yfinance')
+pd = lazy_import('pandas')
+
+REFRESH_INTERVAL = int(os.environ.get('TREASURYPRO_EVENTS_REFRESH', str(6 * 60 * 60)))  # seconds, 0 disables
+EVENTS_TTL = 7 * 24 * 60 * 60
+INDEX_KEY = 'events:index'
+# How long a process serves its decoded copy of the shared index
+SNAPSHOT_SECONDS = 30
+
+
+def _date_str(value):
+    """ISO date string for a date/datetime/Timestamp/string, or None"""
+    if value is None:
+        return None
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y-%m-%d')
+    return str(value).split()[0]
+
+
+def parse_calendar(calendar, ticker_symbol, company_name=None):
+    """Events from a yfinance calendar (dict in newer releases, DataFrame in older ones)"""
+    name = company_name or ticker_symbol
+    if calendar is None:
+        return []
+    if isinstance(calendar, dict):
+        get = calendar.get
+    elif hasattr(calendar, 'index'):
+        if getattr(calendar, 'empty', False):
+            return []
+        def get(key):
+            if key not in calendar.index:
+                return None
+            row = calendar.loc[key]
+            return list(row) if isinstance(row, pd.Series) else row
+    else:
+        return []
+
+    events = []
+    earnings = get('Earnings Date')
+    if earnings is not None:
+        for d in (earnings if isinstance(earnings, (list, tuple)) else [earnings]):
+            d = _date_str(d)
+            if d:
+                events.append({
+                    'type': 'Earnings Call',
+                    'date': d,
+                    'description': f'{name} Quarterly Earnings Report and Conference Call'
+                })
+    ex_div = _date_str(get('Ex-Dividend Date'))
+    if ex_div:
+        events.append({
+            'type': 'Ex-Dividend Date',
+            'date': ex_div,
+            'description': 'Last date to purchase shares to receive upcoming dividend'
+        })
+    div = _date_str(get('Dividend Date'))
+    if div:
+        events.append({
+            'type': 'Dividend Payment',
+            'date': div,
+            'description': f'{name} dividend payment date'
+        })
+    # Earnings dates often come as a (low, high) window with equal ends
+    unique = []
+    for event in events:
+        if event not in unique:
+            unique.append(event)
+    return unique
+
+
+class EventsIndex:
+    """Date-sorted events across all tracked tickers"""
+
+    def __init__(self):
+        self.lease = Lease('events-refresh', max(REFRESH_INTERVAL, 60) + 300)
+        # (loaded at, dates, entries) swapped atomically so readers never take the lock
+        self._snapshot = (0, [], [])
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    @staticmethod
+    def _key(ticker):
+        return f"events:{ticker.upper()}"
+
+    def _stored(self, ticker, fresh=False):
+        state = shared_cache.get(self._key(ticker), fresh=fresh)
+        return None if state is MISS else state
+
+    @staticmethod
+    def _sorted(entries):
+        return sorted(entries, key=lambda e: (e['date'], e['ticker'], e['type']))
+
+    def _publish(self, entries):
+        shared_cache.set(INDEX_KEY, entries, EVENTS_TTL)
+        self._snapshot = (time.time(), [e['date'] for e in entries], entries)
+
+    def _fetch(self, ticker, company_name=None, ticker_obj=None):
+        """Read one ticker's calendar from upstream into the shared cache"""
+        stored = self._stored(ticker, fresh=True) or {}
+        name = company_name or stored.get('name')
+        try:
+            market_data.throttle()
+            calendar = (ticker_obj or yf.Ticker(ticker)).calendar
+            events = parse_calendar(calendar, ticker, name)
+        except Exception as e:
+            print(f"Calendar error for {ticker}: {e}")
+            return None
+        shared_cache.set(self._key(ticker), {'events': events, 'name': name, 'refreshed': time.time()}, EVENTS_TTL)
+        return events
+
+    def refresh(self, ticker, company_name=None, ticker_obj=None):
+        """Re-read one ticker's calendar from upstream and re-index it"""
+        ticker = ticker.upper()
+        events = self._fetch(ticker, company_name, ticker_obj)
+        if events is None:
+            return None
+        with self._lock:
+            current = shared_cache.get(INDEX_KEY, fresh=True)
+            others = [e for e in (current if current is not MISS else []) if e['ticker'] != ticker]
+            self._publish(self._sorted(others + [dict(event, ticker=ticker) for event in events]))
+        return events
+
+    def refresh_all(self):
+        tickers = watchlist.tickers()
+        for ticker in tickers:
+            # Renewing per ticker keeps the lease through a long pass
+            if self._stop.is_set() or not self.lease.acquire():
+                return
+            self._fetch(ticker)
+        # Rebuild from the per-ticker entries, which also drops tickers no longer tracked
+        entries = []
+        for ticker in tickers:
+            stored = self._stored(ticker, fresh=True)
+            if stored:
+                entries += [dict(event, ticker=ticker) for event in stored['events']]
+        with self._lock:
+            self._publish(self._sorted(entries))
+
+    def track(self, ticker, company_name=None, ticker_obj=None):
+        """Add a ticker to the watchlist and index it now if it never has been"""
+        ticker = ticker.upper()
+        watchlist.add(ticker)
+        if self._stored(ticker) is None:
+            self.refresh(ticker, company_name, ticker_obj)
+
+    def for_ticker(self, ticker):
+        stored = self._stored(ticker)
+        return list(stored['events']) if stored else []
+
+    def _current(self):
+        loaded_at, dates, entries = self._snapshot
+        if time.time() - loaded_at > SNAPSHOT_SECONDS:
+            shared = shared_cache.get(INDEX_KEY, fresh=True)
+            entries = shared if shared is not MISS else []
+            dates = [e['date'] for e in entries]
+            self._snapshot = (time.time(), dates, entries)
+        return dates, entries
+
+    def range(self, start, end, tickers=None):
+        """Events with start <= date <= end (ISO strings), optionally for some tickers"""
+        dates, entries = self._current()
+        lo = bisect.bisect_left(dates, start)
+        hi = bisect.bisect_right(dates, end)
+        if tickers is None:
+            return entries[lo:hi]
+        wanted = set(tickers)
+        return [e for e in entries[lo:hi] if e['ticker'] in wanted]
+
+    def start(self):
+        if REFRESH_INTERVAL <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='events-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            leading = False
+            try:
+                leading = self.lease.acquire()
+                if leading:
+                    self.refresh_all()
+            except Exception as e:
+                print(f"Events refresh error: {e}")
+            # Non-holders check back sooner, so a dead holder is replaced quickly
+            self._stop.wait(REFRESH_INTERVAL if leading else min(REFRESH_INTERVAL, 300))
+
+    def stats(self):
+        holder = self.lease.holder()
+        return {'refreshLeader': holder, 'isLeader': holder == Lease.owner()}
+
+
+def _ical_escape(text):
+    return text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def to_ical(entries):
+    """Render index entries as an iCalendar (RFC 5545) document of all-day events"""
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//TreasuryPro//Events Calendar//EN',
+        'CALSCALE:GREGORIAN'
+    ]
+    for e in entries:
+        day = e['date'].replace('-', '')
+        lines += [
+            'BEGIN:VEVENT',
+            f"UID:{e['ticker']}-{e['type'].replace(' ', '')}-{day}@treasurypro",
+            f'DTSTAMP:{stamp}',
+            f'DTSTART;VALUE=DATE:{day}',
+            f"SUMMARY:{_ical_escape(e['ticker'] + ' ' + e['type'])}",
+            f"DESCRIPTION:{_ical_escape(e['description'])}",
+            'END:VEVENT'
+        ]
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(lines) + '\r\n'
+
+
+events_index = EventsIndex()
@@ -0,0 +1,43 @@
+"""Production server config: preforked gunicorn workers sharing one cache.
+
+Run with:  gunicorn -c gunicorn.conf.py
+Override any setting with the TREASURYPRO_* environment variables below.
+"""
+import os
+import multiprocessing
+
+wsgi_app = 'wsgi:app'
+bind = os.environ.get('TREASURYPRO_BIND', '0.0.0.0:8000')
+
+# One process per core. Concurrency comes from threads instead of extra
+# processes, because most request time is spent waiting on Yahoo Finance,
+# World Bank and web-search calls, and every worker process also carries its
+# own background threads (quote hub, news and events pollers) and L1 cache.
+# Every open live-quote stream (/api/quotes/stream) holds a thread, so each
+# worker caps them at THREADS // 4 (see quotes.MAX_STREAMS).
+workers = int(os.environ.get('TREASURYPRO_WORKERS', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.environ.get('TREASURYPRO_THREADS', 16))
+
+# Import the app once in the master, then fork, so workers share its memory.
+# The app itself is light; yfinance/pandas load in each worker's warm-up.
+preload_app = True
+
+# A cold /api/stock analysis takes ~40 seconds
+timeout = int(os.environ.get('TREASURYPRO_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers periodically to bound memory growth from pandas/yfinance
+max_requests = 1000
+max_requests_jitter = 100
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    # Threads don't survive fork, so warm-up starts in each worker.
+    # /api/ready returns 503 until it finishes.
+    from app import start_warm_up
+    start_warm_up()
@@ -0,0 +1,54 @@
+"""Deferred imports for heavy dependencies.
+
+yfinance and pandas (plus openpyxl, pulled in by pd.ExcelWriter) add most of
+a second to startup. Modules bound with ``lazy_import`` are only imported on
+first attribute access, so processes that only serve /api/health or cached
+JSON never pay for them.
+"""
+import sys
+import time
+import types
+import importlib
+import threading
+
+# Import duration (ms) of each lazily loaded module, for /api/ready
+load_times = {}
+
+
+class LazyModule(types.ModuleType):
+    """Module proxy that imports the real module on first attribute access"""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self._lazy_lock = threading.Lock()
+        self._lazy_module = None
+
+    def _load(self):
+        if self._lazy_module is None:
+            with self._lazy_lock:
+                if self._lazy_module is None:
+                    started = time.perf_counter()
+                    module = importlib.import_module(self.__name__)
+                    load_times[self.__name__] = round((time.perf_counter() - started) * 1000, 1)
+                    self._lazy_module = module
+        return self._lazy_module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name):
+    """Return a proxy for ``name`` that imports it on first use"""
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
+
+
+def load(*modules):
+    """Force-import lazy module proxies (used by warm-up)"""
+    for module in modules:
+        if isinstance(module, LazyModule):
+            module._load()
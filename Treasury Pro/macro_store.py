@@ -0,0 +1,329 @@
+"""Local store of full World Bank indicator histories.
+
+Values live in one float64 array shaped (indicator, country, year), saved as a
+raw file and opened with numpy.memmap, so opening the store costs nothing and
+only the pages a query touches are read from disk. Missing values are NaN.
+A small meta.json next to it maps indicator codes, ISO3 country codes and
+years to array positions.
+
+Load data with bulk imports of World Bank dumps, either the CSV files from
+the "Download CSV" link on data.worldbank.org (API_<code>_DS2_en_csv_v2_*.csv)
+or JSON responses from api.worldbank.org/v2:
+
+    python macro_store.py import API_NY.GDP.MKTP.CD_DS2_en_csv_v2_*.csv
+    python macro_store.py fetch NY.GDP.MKTP.CD FP.CPI.TOTL.ZG
+    python macro_store.py info
+"""
+import os
+import sys
+import csv
+import json
+import threading
+
+from lazy import lazy_import
+
+np = lazy_import('numpy')
+
+MACRO_DIR = os.environ.get(
+    'TREASURYPRO_MACRO_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'macro')
+)
+VALUES_FILE = 'values.f64'
+META_FILE = 'meta.json'
+
+# World Bank region, income and lending group aggregates. The dumps list them
+# alongside countries; they're dropped on import so rankings only hold countries.
+AGGREGATES = frozenset([
+    'AFE', 'AFW', 'ARB', 'CEB', 'CSS', 'EAP', 'EAR', 'EAS', 'ECA', 'ECS', 'EMU', 'EUU',
+    'FCS', 'HIC', 'HPC', 'IBD', 'IBT', 'IDA', 'IDB', 'IDX', 'INX', 'LAC', 'LCN', 'LDC',
+    'LIC', 'LMC', 'LMY', 'LTE', 'MEA', 'MIC', 'MNA', 'NAC', 'OED', 'OSS', 'PRE', 'PSS',
+    'PST', 'SAS', 'SSA', 'SSF', 'SST', 'TEA', 'TEC', 'TLA', 'TMN', 'TSA', 'TSS', 'UMC',
+    'WLD'
+])
+
+
+def parse_csv(path):
+    """Yield (indicator, name, iso3, country_name, iso2, year, value) from a World Bank CSV dump
+
+    The CSV files carry no ISO2 codes, so that field is always None.
+    """
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = None
+        for row in reader:
+            # The bulk files start with a few metadata lines before the header
+            if header is None:
+                if len(row) > 4 and row[0] == 'Country Name':
+                    header = row
+                continue
+            if len(row) < 5:
+                continue
+            country_name, iso3, indicator_name, indicator = row[:4]
+            for col, cell in zip(header[4:], row[4:]):
+                if col.isdigit() and cell not in ('', None):
+                    yield indicator, indicator_name, iso3, country_name, None, int(col), float(cell)
+
+
+def parse_json(path):
+    """Yield rows from a World Bank API JSON response (or a list of pages)"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    pages = data if data and isinstance(data[0], list) else [data]
+    for page in pages:
+        entries = page[1] if len(page) > 1 and isinstance(page[0], dict) else page
+        for entry in entries or []:
+            if entry.get('value') is None or not str(entry.get('date', '')).isdigit():
+                continue
+            country = entry.get('country') or {}
+            indicator = entry.get('indicator') or {}
+            iso3 = entry.get('countryiso3code') or country.get('id')
+            if not iso3:
+                continue
+            yield (indicator.get('id'), indicator.get('value'), iso3, country.get('value'),
+                   country.get('id'), int(entry['date']), float(entry['value']))
+
+
+class MacroStore:
+    """Memory-mapped (indicator x country x year) array plus its index"""
+
+    def __init__(self, directory=MACRO_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._mtime = None
+        self.values = None
+        self.meta = {}
+
+    def _meta_mtime(self):
+        try:
+            return os.stat(os.path.join(self.directory, META_FILE)).st_mtime
+        except OSError:
+            return None
+
+    def _load(self):
+        # An import in another process rewrites the files; pick that up
+        if self._loaded and self._mtime == self._meta_mtime():
+            return
+        with self._lock:
+            mtime = self._meta_mtime()
+            if self._loaded and self._mtime == mtime:
+                return
+            self.values = None
+            self.meta = {}
+            self._mtime = mtime
+            if mtime is not None:
+                with open(os.path.join(self.directory, META_FILE)) as f:
+                    self.meta = json.load(f)
+                self.values = np.memmap(
+                    os.path.join(self.directory, VALUES_FILE),
+                    dtype='float64', mode='r', shape=tuple(self.meta['shape'])
+                )
+                self._index()
+            self._loaded = True
+
+    def _index(self):
+        self.ind_pos = {code: i for i, code in enumerate(self.meta['indicators'])}
+        self.cty_pos = {code: i for i, code in enumerate(self.meta['countries'])}
+        self.first_year = self.meta['years'][0]
+
+    @property
+    def available(self):
+        self._load()
+        return self.values is not None
+
+    def has(self, indicator):
+        return self.available and indicator in self.ind_pos
+
+    def country_code(self, code):
+        """ISO3 code for an ISO3 or ISO2 code, or None if unknown"""
+        code = code.upper()
+        if code in self.cty_pos:
+            return code
+        return self.meta.get('iso2', {}).get(code)
+
+    def _resolve(self, indicator, countries, start, end):
+        i = self.ind_pos.get(indicator)
+        if i is None:
+            raise KeyError(f'Unknown indicator {indicator}')
+        if countries:
+            codes = [c for c in (self.country_code(c) for c in countries) if c]
+        else:
+            codes = self.meta['countries']
+        first, last = self.meta['years']
+        start = max(first, start or first)
+        end = min(last, end or last)
+        return i, codes, start, end
+
+    def series(self, indicator, countries=None, start=None, end=None):
+        """{iso3: [{'year', 'value'}...]} for a year range, skipping missing values"""
+        self._load()
+        i, codes, start, end = self._resolve(indicator, countries, start, end)
+        rows = [self.cty_pos[c] for c in codes]
+        block = np.asarray(self.values[i, rows, start - self.first_year:end - self.first_year + 1])
+        years = np.arange(start, end + 1)
+        result = {}
+        for code, row in zip(codes, block):
+            mask = ~np.isnan(row)
+            if mask.any():
+                result[code] = [{'year': int(y), 'value': float(v)} for y, v in zip(years[mask], row[mask])]
+        return result
+
+    def latest(self, indicator, countries=None, end=None):
+        """{iso3: (year, value)} with each country's most recent non-missing value"""
+        self._load()
+        i, codes, start, end = self._resolve(indicator, countries, None, end)
+        rows = [self.cty_pos[c] for c in codes]
+        block = np.asarray(self.values[i, rows, :end - self.first_year + 1])
+        present = ~np.isnan(block)
+        # Position of the last non-NaN value in each row
+        last = block.shape[1] - 1 - np.argmax(present[:, ::-1], axis=1)
+        result = {}
+        for code, row, pos, has_value in zip(codes, block, last, present.any(axis=1)):
+            if has_value:
+                result[code] = (int(self.first_year + pos), float(row[pos]))
+        return result
+
+    def ranking(self, indicator, year, countries=None, top=20, ascending=False):
+        """Countries ranked by an indicator's value in one year"""
+        self._load()
+        i, codes, start, end = self._resolve(indicator, countries, year, year)
+        if start != year or end != year:
+            return []
+        rows = np.array([self.cty_pos[c] for c in codes], dtype=np.int64)
+        column = np.asarray(self.values[i, rows, year - self.first_year])
+        valid = ~np.isnan(column)
+        rows, column = rows[valid], column[valid]
+        order = np.argsort(column if ascending else -column, kind='stable')[:top]
+        return [
+            {
+                'rank': rank + 1,
+                'country': self.meta['countries'][rows[pos]],
+                'name': self.meta['countryNames'].get(self.meta['countries'][rows[pos]]),
+                'value': float(column[pos])
+            }
+            for rank, pos in enumerate(order)
+        ]
+
+    def info(self):
+        if not self.available:
+            return {'available': False, 'directory': self.directory}
+        return {
+            'available': True,
+            'directory': self.directory,
+            'indicators': [{'code': c, 'name': self.meta['indicatorNames'].get(c)} for c in self.meta['indicators']],
+            'countries': len(self.meta['countries']),
+            'years': self.meta['years']
+        }
+
+    def import_files(self, paths):
+        """Merge World Bank CSV/JSON dumps into the store (rewrites it atomically)
+
+        Aggregates (AGGREGATES) are skipped, and any stored by an older import
+        are dropped.
+        """
+        self._load()
+        rows = []
+        indicator_names = dict(self.meta.get('indicatorNames', {}))
+        country_names = dict(self.meta.get('countryNames', {}))
+        iso2 = dict(self.meta.get('iso2', {}))
+        for path in paths:
+            parser = parse_json if path.lower().endswith('.json') else parse_csv
+            count = 0
+            skipped = 0
+            for indicator, ind_name, iso3, cty_name, cty_iso2, year, value in parser(path):
+                if not indicator:
+                    continue
+                if iso3 in AGGREGATES:
+                    skipped += 1
+                    continue
+                rows.append((indicator, iso3, year, value))
+                if ind_name:
+                    indicator_names[indicator] = ind_name
+                if cty_name:
+                    country_names[iso3] = cty_name
+                if cty_iso2 and cty_iso2 != iso3:
+                    iso2[cty_iso2] = iso3
+                count += 1
+            print(f"Parsed {count} values from {path} ({skipped} aggregate values skipped)")
+        if not rows:
+            return 0
+
+        indicators = sorted(set(self.meta.get('indicators', [])) | {r[0] for r in rows})
+        kept = [c for c in self.meta.get('countries', []) if c not in AGGREGATES]
+        countries = sorted(set(kept) | {r[1] for r in rows})
+        old_years = self.meta.get('years')
+        years = [r[2] for r in rows] + (old_years or [])
+        first, last = min(years), max(years)
+
+        values = np.full((len(indicators), len(countries), last - first + 1), np.nan)
+        ind_pos = {c: i for i, c in enumerate(indicators)}
+        cty_pos = {c: i for i, c in enumerate(countries)}
+        if self.values is not None:
+            # Carry existing data over into the (possibly larger) new array
+            ii = [ind_pos[c] for c in self.meta['indicators']]
+            old_pos = {c: i for i, c in enumerate(self.meta['countries'])}
+            cc = [cty_pos[c] for c in kept]
+            y0 = old_years[0] - first
+            values[np.ix_(ii, cc, range(y0, y0 + self.values.shape[2]))] = self.values[:, [old_pos[c] for c in kept], :]
+        idx = np.array([(ind_pos[r[0]], cty_pos[r[1]], r[2] - first) for r in rows])
+        values[idx[:, 0], idx[:, 1], idx[:, 2]] = [r[3] for r in rows]
+
+        meta = {
+            'shape': list(values.shape),
+            'indicators': indicators,
+            'indicatorNames': indicator_names,
+            'countries': countries,
+            'countryNames': {c: n for c, n in country_names.items() if c not in AGGREGATES},
+            'iso2': {k: v for k, v in iso2.items() if v not in AGGREGATES},
+            'years': [first, last]
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        values_path = os.path.join(self.directory, VALUES_FILE)
+        meta_path = os.path.join(self.directory, META_FILE)
+        values.tofile(values_path + '.tmp')
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump(meta, f)
+        with self._lock:
+            os.replace(values_path + '.tmp', values_path)
+            os.replace(meta_path + '.tmp', meta_path)
+            self._loaded = False
+        self._load()
+        return len(rows)
+
+
+def fetch_dump(indicator, directory=MACRO_DIR):
+    """Download an indicator's full history for all countries as a JSON dump"""
+    import requests
+    url = f'https://api.worldbank.org/v2/country/all/indicator/{indicator}?format=json&per_page=20000'
+    pages = []
+    page = 1
+    while True:
+        response = requests.get(f'{url}&page={page}', timeout=60)
+        response.raise_for_status()
+        data = response.json()
+        pages.append(data)
+        if len(data) < 2 or page >= data[0].get('pages', 1):
+            break
+        page += 1
+    os.makedirs(os.path.join(directory, 'dumps'), exist_ok=True)
+    path = os.path.join(directory, 'dumps', f'{indicator}.json')
+    with open(path, 'w') as f:
+        json.dump(pages, f)
+    return path
+
+
+macro_store = MacroStore()
+
+
+if __name__ == '__main__':
+    command, args = (sys.argv[1], sys.argv[2:]) if len(sys.argv) > 1 else ('info', [])
+    if command == 'import' and args:
+        print(f"Imported {macro_store.import_files(args)} values")
+    elif command == 'fetch' and args:
+        paths = [fetch_dump(code) for code in args]
+        print(f"Imported {macro_store.import_files(paths)} values")
+    elif command == 'info':
+        print(json.dumps(macro_store.info(), indent=2))
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,77 @@
+"""Cached Yahoo Finance reads.
+
+Each loader goes through the shared cache, so a ticker's info, statements or
+price history fetched by any worker on any node is served to all of them
+until it expires. Batch jobs can set ``upstream_budget`` to a
+ratelimit.TokenBucket; every cache miss then waits for a token before
+calling Yahoo.
+"""
+from cache import MISS, cached
+from lazy import lazy_import
+from statements import QUARTERLY_STATEMENT_ATTRS, STATEMENT_ATTRS
+
+yf = lazy_import('yfinance')
+
+# Cache lifetimes (seconds)
+INFO_TTL = 15 * 60
+HISTORY_TTL = 60 * 60
+STATEMENTS_TTL = 12 * 60 * 60
+
+# Shared rate budget for upstream calls (None = unlimited)
+upstream_budget = None
+
+
+def throttle():
+    """Wait for the upstream budget, if one is set"""
+    if upstream_budget is not None:
+        upstream_budget.acquire()
+
+
+@cached('info', INFO_TTL)
+def get_info(ticker_symbol):
+    """yfinance Ticker.info"""
+    throttle()
+    return yf.Ticker(ticker_symbol).info
+
+
+@cached('history', HISTORY_TTL)
+def get_history(ticker_symbol, period):
+    """Daily price history for a yfinance period string ('3y', '5y', ...)"""
+    throttle()
+    return yf.Ticker(ticker_symbol).history(period=period)
+
+
+@cached('statement', STATEMENTS_TTL)
+def get_statement(ticker_symbol, kind, frequency='annual'):
+    """Raw statement: kind is 'income', 'balance' or 'cashflow', frequency 'annual' or 'quarterly'.
+
+    None when Yahoo has no data (or the fetch failed).
+    """
+    attrs = QUARTERLY_STATEMENT_ATTRS if frequency == 'quarterly' else STATEMENT_ATTRS
+    throttle()
+    frame = getattr(yf.Ticker(ticker_symbol), attrs[kind])
+    # yfinance returns an empty frame rather than raising when the fetch fails;
+    # None keeps it out of the cache so the next call retries
+    return None if frame is None or frame.empty else frame
+
+
+def get_statements(ticker_symbol, frequency='annual'):
+    """All three raw statements, keyed by kind"""
+    statements = {}
+    for kind in STATEMENT_ATTRS:
+        try:
+            # Annual cache keys predate the frequency argument
+            if frequency == 'annual':
+                statements[kind] = get_statement(ticker_symbol, kind)
+            else:
+                statements[kind] = get_statement(ticker_symbol, kind, frequency)
+        except Exception as e:
+            print(f"Error loading {frequency} {kind} statement for {ticker_symbol}: {e}")
+            statements[kind] = None
+    return statements
+
+
+def statements_cached(ticker_symbol, frequency='annual'):
+    """True if get_statements would be served entirely from the cache"""
+    args = () if frequency == 'annual' else (frequency,)
+    return all(get_statement.peek(ticker_symbol, kind, *args) is not MISS for kind in STATEMENT_ATTRS)
@@ -0,0 +1,245 @@
+"""Incremental company news poller with per-ticker ring buffers.
+
+A background thread polls Yahoo Finance news for every watchlist ticker.
+Each ticker keeps a since-cursor (newest publish time seen) and a bounded,
+time-ordered buffer of articles deduplicated by a hash of the canonical URL.
+Request handlers read from the buffers instead of calling upstream.
+
+Buffers live in the shared cache, so every worker process serves the same
+news. Every process runs the poller thread, but only the holder of the
+``news-poller`` lease polls, so upstream traffic doesn't grow with the
+number of workers.
+"""
+import os
+import time
+import heapq
+import hashlib
+import threading
+from datetime import datetime
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import market_data
+import watchlist
+from cache import Lease, MISS, shared_cache
+from lazy import lazy_import
+
+yf = lazy_import('yfinance')
+
+POLL_INTERVAL = int(os.environ.get('TREASURYPRO_NEWS_POLL', '300'))  # seconds, 0 disables
+BUFFER_SIZE = int(os.environ.get('TREASURYPRO_NEWS_BUFFER', '100'))
+# Buffers of tickers that stop being polled expire after this long
+BUFFER_TTL = 24 * 60 * 60
+
+# Query parameters that only track the click and don't identify the article
+TRACKING_PARAMS = ('utm_', 'guccounter', 'guce_', 'ncid', 'fbclid', 'gclid', '.tsrc', 'yptr', 'soc_')
+
+
+def canonical_url(url):
+    """Normalize a URL so the same article from different feeds compares equal"""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    query = [(k, v) for k, v in parse_qsl(parts.query) if not k.lower().startswith(TRACKING_PARAMS)]
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit(('https', host, path, urlencode(sorted(query)), ''))
+
+
+def url_hash(url):
+    return hashlib.sha1(canonical_url(url).encode('utf-8')).hexdigest()[:16]
+
+
+def _is_useful_title(title):
+    """Filter out generic or short titles"""
+    return bool(title) and len(title) > 15 and 'update' not in title.lower()
+
+
+def parse_yahoo_item(item, ticker_symbol):
+    """Convert a yfinance news item (old flat or new nested format) to our shape"""
+    content = item.get('content')
+    if isinstance(content, dict):
+        title = content.get('title', '')
+        link = (content.get('canonicalUrl') or {}).get('url') or (content.get('clickThroughUrl') or {}).get('url', '')
+        publisher = (content.get('provider') or {}).get('displayName', '')
+        try:
+            publish_time = int(datetime.fromisoformat(content.get('pubDate', '').replace('Z', '+00:00')).timestamp())
+        except ValueError:
+            publish_time = 0
+    else:
+        title = item.get('title', '')
+        link = item.get('link', '')
+        publisher = item.get('publisher', item.get('source', ''))
+        publish_time = item.get('providerPublishTime', 0)
+
+    if not _is_useful_title(title):
+        return None
+    link = link if link else f'https://finance.yahoo.com/quote/{ticker_symbol}/news'
+    return {
+        'id': url_hash(link),
+        'title': title,
+        'link': link,
+        'publisher': publisher if publisher else 'Financial News',
+        'time': int(publish_time or 0),
+        'source': 'Yahoo Finance'
+    }
+
+
+class NewsBuffer:
+    """Bounded, time-ordered (oldest first) article buffer for one ticker"""
+
+    def __init__(self, size=BUFFER_SIZE):
+        self.size = size
+        self.items = []
+        self.ids = set()
+        self.cursor = 0         # newest publish time seen
+        self.last_poll = 0      # wall-clock time of the last successful poll
+
+    def to_dict(self):
+        return {'items': self.items, 'cursor': self.cursor, 'lastPoll': self.last_poll}
+
+    @classmethod
+    def from_dict(cls, state, size=BUFFER_SIZE):
+        buf = cls(size)
+        buf.items = state['items']
+        buf.ids = {item['id'] for item in buf.items}
+        buf.cursor = state['cursor']
+        buf.last_poll = state['lastPoll']
+        return buf
+
+    def add(self, items):
+        """Insert unseen items, keeping time order; returns how many were added"""
+        added = 0
+        for item in sorted(items, key=lambda i: i['time']):
+            if item['id'] in self.ids:
+                continue
+            if not self.items or item['time'] >= self.items[-1]['time']:
+                self.items.append(item)
+            else:
+                # Late arrival older than the tail: rare, buffer is small
+                pos = len(self.items)
+                while pos > 0 and self.items[pos - 1]['time'] > item['time']:
+                    pos -= 1
+                self.items.insert(pos, item)
+            self.ids.add(item['id'])
+            self.cursor = max(self.cursor, item['time'])
+            added += 1
+        excess = len(self.items) - self.size
+        if excess > 0:
+            for old in self.items[:excess]:
+                self.ids.discard(old['id'])
+            del self.items[:excess]
+        return added
+
+    def latest(self, limit=10, since=0):
+        """Newest-first items published after ``since``"""
+        result = []
+        for item in reversed(self.items):
+            if item['time'] <= since or len(result) >= limit:
+                break
+            result.append(item)
+        return result
+
+
+class NewsHub:
+    """Shared per-ticker buffers plus the background poller that fills them"""
+
+    def __init__(self):
+        self.lease = Lease('news-poller', POLL_INTERVAL + 120)
+        self._thread = None
+        self._stop = threading.Event()
+
+    @staticmethod
+    def _key(ticker):
+        return f"news:{ticker.upper()}"
+
+    def buffer(self, ticker, fresh=False):
+        """The ticker's buffer, or None if it has never been polled"""
+        state = shared_cache.get(self._key(ticker), fresh=fresh)
+        return None if state is MISS else NewsBuffer.from_dict(state)
+
+    def poll(self, ticker):
+        """Fetch upstream news for one ticker and add anything past its cursor"""
+        ticker = ticker.upper()
+        try:
+            market_data.throttle()
+            raw = yf.Ticker(ticker).news or []
+        except Exception as e:
+            print(f"Yahoo Finance news error for {ticker}: {e}")
+            return 0
+        buf = self.buffer(ticker, fresh=True) or NewsBuffer()
+        items = [parse_yahoo_item(item, ticker) for item in raw if isinstance(item, dict)]
+        fresh = [item for item in items if item and (item['time'] > buf.cursor or item['time'] == 0)]
+        added = buf.add(fresh)
+        buf.last_poll = time.time()
+        shared_cache.set(self._key(ticker), buf.to_dict(), BUFFER_TTL)
+        return added
+
+    def poll_all(self):
+        for ticker in watchlist.tickers():
+            # Renewing per ticker keeps the lease through a long pass
+            if self._stop.is_set() or not self.lease.acquire():
+                break
+            added = self.poll(ticker)
+            if added:
+                print(f"News poller: {added} new items for {ticker}")
+
+    def track(self, ticker):
+        """Poll a ticker that has never been polled; it joins the watchlist if it has news.
+
+        Returns False without polling for strings that aren't ticker symbols.
+        """
+        if not watchlist.valid(ticker):
+            return False
+        if self.buffer(ticker) is None:
+            self.poll(ticker)
+            buf = self.buffer(ticker, fresh=True)
+            if buf is not None and buf.items:
+                watchlist.add(ticker)
+        return True
+
+    def latest(self, ticker, limit=10, since=0):
+        buf = self.buffer(ticker)
+        return buf.latest(limit, since) if buf is not None else []
+
+    def merged(self, tickers, limit=50, since=0):
+        """Newest-first news across tickers, deduplicated across feeds"""
+        streams = [
+            [dict(item, ticker=t) for item in self.latest(t, limit, since)]
+            for t in tickers
+        ]
+        results = []
+        seen = set()
+        for item in heapq.merge(*streams, key=lambda i: -i['time']):
+            if item['id'] in seen:
+                continue
+            seen.add(item['id'])
+            results.append(item)
+            if len(results) >= limit:
+                break
+        return results
+
+    def start(self):
+        if POLL_INTERVAL <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='news-poller', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.lease.acquire():
+                    self.poll_all()
+            except Exception as e:
+                print(f"News poller error: {e}")
+            self._stop.wait(POLL_INTERVAL)
+
+    def stats(self):
+        holder = self.lease.holder()
+        return {'pollerLeader': holder, 'isLeader': holder == Lease.owner()}
+
+
+news_hub = NewsHub()
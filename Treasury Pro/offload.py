@@ -0,0 +1,267 @@
+"""Process pool for CPU-bound work: workbook rendering and batch analytics.
+
+openpyxl and large NumPy/pandas reductions hold the GIL, so running them on
+a request thread stalls every other request in the same worker. Jobs here
+run in a small pool of spawned processes instead. Inputs and results travel
+through temp files in the cache codec (JSON or the columnar float64 frame
+layout, see cache.encode), never as pickled DataFrames; only file paths
+cross the process boundary.
+
+The pool is bounded: at most OFFLOAD_WORKERS jobs run and OFFLOAD_QUEUE
+wait, anything beyond is shed with admission.Overloaded (503 + Retry-After).
+A job still running after OFFLOAD_TIMEOUT raises OffloadTimeout and only the
+process running it is killed; multiprocessing.Pool replaces it and the other
+jobs carry on. A job still queued at its timeout is skipped when it starts.
+TREASURYPRO_OFFLOAD_WORKERS=0 runs jobs inline.
+"""
+import os
+import time
+import uuid
+import signal
+import tempfile
+import threading
+import multiprocessing
+
+from admission import Overloaded
+from cache import decode, encode
+
+OFFLOAD_WORKERS = int(os.environ.get('TREASURYPRO_OFFLOAD_WORKERS', '2'))
+OFFLOAD_QUEUE = int(os.environ.get('TREASURYPRO_OFFLOAD_QUEUE', '8'))
+OFFLOAD_TIMEOUT = float(os.environ.get('TREASURYPRO_OFFLOAD_TIMEOUT', '30'))  # seconds
+OFFLOAD_DIR = os.environ.get(
+    'TREASURYPRO_OFFLOAD_DIR', os.path.join(tempfile.gettempdir(), 'treasurypro-offload')
+)
+# Temp files older than this are leftovers from killed jobs
+STALE_SECONDS = 60 * 60
+# Replace each pool process after this many jobs to bound memory growth
+MAX_TASKS_PER_CHILD = 100
+
+
+class OffloadTimeout(Exception):
+    """A pooled job ran longer than its timeout"""
+
+
+def _temp_path(suffix='.bin'):
+    os.makedirs(OFFLOAD_DIR, exist_ok=True)
+    return os.path.join(OFFLOAD_DIR, f"{os.getpid()}-{uuid.uuid4().hex}{suffix}")
+
+
+def _write(value):
+    path = _temp_path()
+    with open(path, 'wb') as f:
+        f.write(encode(value))
+    return path
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return decode(f.read())
+
+
+def _remove(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# --- Jobs (run in the pool processes) -----------------------------------------
+
+def _call(job, args, marker):
+    """Pool entry point: record which process runs the job, then run it"""
+    if os.path.exists(marker + '.cancel'):
+        _remove([marker + '.cancel'])
+        return None
+    with open(marker + '.pid', 'w') as f:
+        f.write(str(os.getpid()))
+    try:
+        return job(*args)
+    finally:
+        _remove([marker + '.pid'])
+
+
+def render_workbook(sheets, out_path):
+    """Write an XLSX of [(sheet name, input path, include index)] to out_path"""
+    import pandas as pd
+    with pd.ExcelWriter(out_path, engine='openpyxl') as writer:
+        for name, path, index in sheets:
+            data = _read(path)
+            frame = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+            frame.to_excel(writer, sheet_name=name, index=index)
+    return out_path
+
+
+def run_valuation(inputs_path, scenarios, out_path):
+    """Simulate and summarize a batch of valuation inputs (see valuation.py)"""
+    import valuation
+    batch = _read(inputs_path)
+    summaries = valuation.summarize(valuation.simulate(batch, scenarios), batch)
+    with open(out_path, 'wb') as f:
+        f.write(encode(summaries))
+    return out_path
+
+
+# --- Pool --------------------------------------------------------------------
+
+class OffloadPool:
+    """Bounded, lazily started process pool with per-job timeouts and queue metrics"""
+
+    def __init__(self, workers=OFFLOAD_WORKERS, max_queue=OFFLOAD_QUEUE, timeout=OFFLOAD_TIMEOUT):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._pool = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.killed = 0
+        self.shed = 0
+        self.restarts = 0
+        self.avg_ms = 0.0
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._clean_stale()
+                # spawn, not fork: gunicorn workers are multi-threaded
+                self._pool = multiprocessing.get_context('spawn').Pool(
+                    self.workers, maxtasksperchild=MAX_TASKS_PER_CHILD
+                )
+            return self._pool
+
+    def _restart(self, pool):
+        """Replace a pool that can no longer take jobs"""
+        with self._lock:
+            if self._pool is not pool:
+                return  # already replaced by another caller
+            self._pool = None
+            self.restarts += 1
+        pool.terminate()
+
+    def _abandon(self, marker, pending):
+        """Stop a timed-out job: kill the process running it, or skip it if still queued"""
+        try:
+            with open(marker + '.pid') as f:
+                pid = int(f.read())
+        except (OSError, ValueError):
+            # Not started yet (or just finished); make sure it never runs
+            with open(marker + '.cancel', 'w'):
+                pass
+            if pending.ready():
+                _remove([marker + '.cancel'])
+            return
+        try:
+            os.kill(pid, signal.SIGTERM)
+            with self._lock:
+                self.killed += 1
+        except OSError:
+            pass
+        _remove([marker + '.pid'])
+
+    @staticmethod
+    def _clean_stale():
+        if not os.path.isdir(OFFLOAD_DIR):
+            return
+        cutoff = time.time() - STALE_SECONDS
+        for name in os.listdir(OFFLOAD_DIR):
+            path = os.path.join(OFFLOAD_DIR, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def retry_after(self):
+        return int(max(1, min(60, self.avg_ms / 1000 * (self.in_flight / max(self.workers, 1) + 1))))
+
+    def run(self, job, *args, timeout=None):
+        """Run job(*args) in the pool and return its result"""
+        if self.workers <= 0:
+            return job(*args)
+        with self._lock:
+            if self.in_flight >= self.workers + self.max_queue:
+                self.shed += 1
+                raise Overloaded(self.retry_after(), 'offload queue full')
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        started = time.perf_counter()
+        marker = _temp_path('')
+        try:
+            pool = self._get_pool()
+            try:
+                pending = pool.apply_async(_call, (job, args, marker))
+            except ValueError:
+                # "Pool not running": it was terminated under us
+                self._restart(pool)
+                raise Overloaded(1, 'offload pool restarting')
+            try:
+                result = pending.get(timeout or self.timeout)
+            except multiprocessing.TimeoutError:
+                with self._lock:
+                    self.timeouts += 1
+                self._abandon(marker, pending)
+                raise OffloadTimeout(f"{job.__name__} exceeded {timeout or self.timeout:g}s")
+            with self._lock:
+                self.completed += 1
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                self.avg_ms = elapsed_ms if self.completed == 1 else 0.8 * self.avg_ms + 0.2 * elapsed_ms
+            return result
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'maxQueue': self.max_queue,
+                'inFlight': self.in_flight,
+                'queueDepth': max(0, self.in_flight - self.workers),
+                'peakInFlight': self.peak_in_flight,
+                'completed': self.completed,
+                'failed': self.failed,
+                'timeouts': self.timeouts,
+                'killed': self.killed,
+                'shed': self.shed,
+                'restarts': self.restarts,
+                'avgJobMs': round(self.avg_ms, 1),
+                'started': self._pool is not None
+            }
+
+
+offload_pool = OffloadPool()
+
+
+def workbook(sheets):
+    """XLSX bytes for [(sheet name, DataFrame or list of records, include index)]"""
+    paths = []
+    try:
+        specs = []
+        for name, data, index in sheets:
+            paths.append(_write(data))
+            specs.append((name, paths[-1], index))
+        out_path = _temp_path('.xlsx')
+        paths.append(out_path)
+        offload_pool.run(render_workbook, specs, out_path)
+        with open(out_path, 'rb') as f:
+            return f.read()
+    finally:
+        _remove(paths)
+
+
+def valuation_summaries(batch, scenarios):
+    """valuation.summarize(valuation.simulate(batch)) computed in the pool"""
+    paths = [_write(batch), _temp_path()]
+    try:
+        offload_pool.run(run_valuation, paths[0], scenarios, paths[1])
+        return _read(paths[1])
+    finally:
+        _remove(paths)
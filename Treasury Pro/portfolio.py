@@ -0,0 +1,228 @@
+"""Holdings-level risk: covariance, correlation and risk contributions.
+
+Daily closes for every holding are aligned into one (days x tickers) returns
+matrix. Three covariance estimators are supported:
+
+- ``ewma``: RiskMetrics exponentially weighted covariance (decay LAMBDA)
+- ``shrinkage``: Ledoit-Wolf shrinkage of the sample covariance towards a
+  scaled identity, over a sliding WINDOW of days
+- ``sample``: plain sample covariance over the same window
+
+Daily returns are treated as zero-mean, as RiskMetrics does, so every
+estimator reduces to running sums of outer products. A CovarianceEngine
+keeps those sums and absorbs each new day in O(N^2) (dropping the oldest
+day for the windowed estimators) instead of recomputing O(N^2 T) from the
+full history. Engines are kept per process for each set of tickers.
+"""
+import threading
+from collections import OrderedDict, deque
+
+from lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+ESTIMATORS = ('ewma', 'shrinkage', 'sample')
+LAMBDA = 0.94
+WINDOW = 252
+TRADING_DAYS = 252
+MIN_OBSERVATIONS = 60
+MAX_POSITIONS = 500
+# Forward-fill prices across this many missing days (exchange holidays)
+FILL_LIMIT = 5
+MAX_ENGINES = 16
+
+
+def returns_matrix(prices):
+    """Aligned daily returns from a {ticker: Close series} mapping.
+
+    Returns (returns DataFrame, excluded {ticker: reason}). Tickers with fewer
+    than MIN_OBSERVATIONS days are excluded; the rest are aligned on the days
+    all of them have a price.
+    """
+    excluded = {}
+    closes = {}
+    for ticker, series in prices.items():
+        if series is None or len(series.dropna()) <= MIN_OBSERVATIONS:
+            excluded[ticker] = 'not enough price history'
+            continue
+        series = series.dropna()
+        index = pd.DatetimeIndex(series.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        closes[ticker] = pd.Series(series.to_numpy(dtype='float64'), index=index.normalize())
+    if not closes:
+        return pd.DataFrame(), excluded
+    frame = pd.DataFrame(closes).sort_index()
+    frame = frame[~frame.index.duplicated(keep='last')]
+    returns = frame.ffill(limit=FILL_LIMIT).pct_change(fill_method=None).iloc[1:].dropna()
+    return returns, excluded
+
+
+class CovarianceEngine:
+    """Incrementally updated covariance for a fixed, ordered set of tickers"""
+
+    def __init__(self, tickers, estimator='ewma', decay=LAMBDA, window=WINDOW):
+        if estimator not in ESTIMATORS:
+            raise ValueError(f"Unknown estimator {estimator}")
+        self.tickers = list(tickers)
+        self.estimator = estimator
+        self.decay = decay
+        self.window = window
+        n = len(self.tickers)
+        # EWMA state: weighted sum of outer products and sum of weights
+        self.ewma = np.zeros((n, n))
+        self.ewma_weight = 0.0
+        # Window state: sums of outer products and of squared outer products
+        self.rows = deque()
+        self.sxx = np.zeros((n, n))
+        self.sxx2 = np.zeros((n, n))
+        self.last_date = None
+        self.updates = 0
+
+    def fit(self, returns):
+        """Initialise from a full returns matrix (one batched pass)"""
+        values = returns[self.tickers].to_numpy(dtype='float64')
+        weights = (1 - self.decay) * self.decay ** np.arange(len(values) - 1, -1, -1)
+        self.ewma = (values * weights[:, None]).T @ values
+        self.ewma_weight = float(weights.sum())
+        recent = values[-self.window:]
+        self.rows = deque(recent)
+        self.sxx = recent.T @ recent
+        squared = recent ** 2
+        self.sxx2 = squared.T @ squared
+        self.last_date = returns.index[-1]
+        return self
+
+    def update(self, date, row):
+        """Absorb one new day of returns in O(N^2)"""
+        row = np.asarray(row, dtype='float64')
+        outer = np.outer(row, row)
+        self.ewma = self.decay * self.ewma + (1 - self.decay) * outer
+        self.ewma_weight = self.decay * self.ewma_weight + (1 - self.decay)
+        self.rows.append(row)
+        self.sxx += outer
+        self.sxx2 += np.outer(row ** 2, row ** 2)
+        if len(self.rows) > self.window:
+            old = self.rows.popleft()
+            self.sxx -= np.outer(old, old)
+            self.sxx2 -= np.outer(old ** 2, old ** 2)
+        self.last_date = date
+        self.updates += 1
+
+    def catch_up(self, returns):
+        """Apply every day in ``returns`` newer than the last one seen; returns the count"""
+        new = returns.loc[returns.index > self.last_date, self.tickers]
+        for date, row in zip(new.index, new.to_numpy(dtype='float64')):
+            self.update(date, row)
+        return len(new)
+
+    @property
+    def observations(self):
+        return len(self.rows)
+
+    def shrinkage_intensity(self):
+        """Ledoit-Wolf (2004) intensity towards mu * I from the window sums"""
+        n, p = len(self.rows), len(self.tickers)
+        sample = self.sxx / n
+        mu = np.trace(sample) / p
+        delta = (np.sum(sample ** 2) - 2 * mu * np.trace(sample) + p * mu ** 2) / p
+        beta = (np.sum(self.sxx2) / n - np.sum(sample ** 2)) / (p * n)
+        beta = min(max(beta, 0.0), delta)
+        return 0.0 if delta == 0 else beta / delta
+
+    def covariance(self):
+        """(daily covariance matrix, shrinkage intensity or None)"""
+        if self.estimator == 'ewma':
+            return self.ewma / self.ewma_weight, None
+        sample = self.sxx / len(self.rows)
+        if self.estimator == 'sample':
+            return sample, None
+        shrinkage = self.shrinkage_intensity()
+        target = np.eye(len(self.tickers)) * np.trace(sample) / len(self.tickers)
+        return shrinkage * target + (1 - shrinkage) * sample, shrinkage
+
+
+def risk_report(engine, weights, include_correlation=True):
+    """Portfolio volatility, correlation and per-position risk contributions"""
+    cov, shrinkage = engine.covariance()
+    w = np.array([weights[t] for t in engine.tickers], dtype='float64')
+    variance = float(w @ cov @ w)
+    daily_vol = variance ** 0.5
+    vols = np.sqrt(np.diag(cov))
+    marginal = cov @ w / daily_vol if daily_vol > 0 else np.zeros_like(w)
+    contribution = w * marginal
+    annualize = TRADING_DAYS ** 0.5
+
+    report = {
+        'tickers': engine.tickers,
+        'estimator': engine.estimator,
+        'asOf': engine.last_date.strftime('%Y-%m-%d'),
+        'observations': engine.observations,
+        'portfolioVolatility': daily_vol * annualize * 100,
+        'dailyVolatility': daily_vol * 100,
+        'positions': [
+            {
+                'symbol': ticker,
+                'weight': float(w[i]),
+                'volatility': float(vols[i] * annualize * 100),
+                'marginalRisk': float(marginal[i] * annualize * 100),
+                'riskContribution': float(contribution[i] * annualize * 100),
+                'riskContributionPercent': float(contribution[i] / daily_vol * 100) if daily_vol > 0 else 0.0
+            }
+            for i, ticker in enumerate(engine.tickers)
+        ]
+    }
+    if engine.estimator == 'ewma':
+        report['decay'] = engine.decay
+    else:
+        report['window'] = engine.window
+    if shrinkage is not None:
+        report['shrinkage'] = shrinkage
+    if include_correlation:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = cov / np.outer(vols, vols)
+        report['correlation'] = np.nan_to_num(np.clip(corr, -1, 1)).round(4).tolist()
+    return report
+
+
+class EngineRegistry:
+    """Per-process engines keyed by (tickers, estimator), least recently used evicted"""
+
+    def __init__(self, size=MAX_ENGINES):
+        self.size = size
+        self._engines = OrderedDict()
+        self._lock = threading.Lock()
+        self.built = 0
+        self.incremental_days = 0
+
+    def get(self, returns, estimator):
+        """An engine current to the last day of ``returns``"""
+        key = (tuple(returns.columns), estimator)
+        with self._lock:
+            engine = self._engines.get(key)
+            if engine is not None and engine.last_date in returns.index:
+                self.incremental_days += engine.catch_up(returns)
+            else:
+                engine = CovarianceEngine(returns.columns, estimator).fit(returns)
+                self.built += 1
+            self._engines[key] = engine
+            self._engines.move_to_end(key)
+            while len(self._engines) > self.size:
+                self._engines.popitem(last=False)
+            return engine
+
+    def stats(self):
+        with self._lock:
+            return {'engines': len(self._engines), 'built': self.built, 'incrementalDays': self.incremental_days}
+
+
+engines = EngineRegistry()
+
+
+def normalize_weights(holdings):
+    """{ticker: position value or weight} -> weights summing to 1"""
+    total = sum(holdings.values())
+    if not total:
+        raise ValueError('Holdings must not sum to zero')
+    return {ticker: value / total for ticker, value in holdings.items()}
@@ -0,0 +1,226 @@
+"""Opt-in per-request profiler for diagnosing slow API calls.
+
+A request is profiled when it carries ``?profile=1`` (or an ``X-Profile: 1``
+header) together with an ``X-Admin-Token`` header matching the
+TREASURYPRO_ADMIN_TOKEN environment variable. Profiling is disabled entirely
+when no admin token is configured.
+
+While a request is profiled, a background thread samples the request thread's
+Python stack and each ``stage()`` block records wall-clock and CPU time. When
+the request finishes two files are written to the profile directory:
+
+- ``<id>.collapsed`` - collapsed stacks, loadable by speedscope or flamegraph.pl
+- ``<id>.json``      - per-stage wall vs CPU breakdown (wall - cpu = waiting)
+"""
+import os
+import sys
+import json
+import hmac
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILE_DIR = os.environ.get(
+    'TREASURYPRO_PROFILE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles')
+)
+ADMIN_TOKEN = os.environ.get('TREASURYPRO_ADMIN_TOKEN', '')
+SAMPLE_INTERVAL = float(os.environ.get('TREASURYPRO_PROFILE_INTERVAL', '0.005'))
+MAX_PROFILES = int(os.environ.get('TREASURYPRO_MAX_PROFILES', '50'))
+
+_local = threading.local()
+
+
+def is_admin(req):
+    """Check the request's admin token against the configured one"""
+    if not ADMIN_TOKEN:
+        return False
+    token = req.headers.get('X-Admin-Token', '')
+    # Compare bytes: compare_digest rejects str with non-ASCII characters
+    return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+def wants_profile(req):
+    """True when the request asked for profiling and is allowed to"""
+    flag = req.args.get('profile') or req.headers.get('X-Profile')
+    return flag in ('1', 'true', 'yes') and is_admin(req)
+
+
+class RequestProfile:
+    """Sampled stacks and stage timings for a single request"""
+
+    def __init__(self, name):
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{os.getpid()}-{threading.get_ident() % 10000}"
+        self.name = name
+        self.thread_id = threading.get_ident()
+        self.stacks = Counter()
+        self.stages = []
+        self.stage_path = []
+        self.started = time.time()
+        self._wall0 = time.perf_counter()
+        self._cpu0 = time.thread_time()
+        self.wall_ms = 0.0
+        self.cpu_ms = 0.0
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name='profiler-sampler', daemon=True)
+
+    def start(self):
+        self._sampler.start()
+
+    def stop(self):
+        self.wall_ms = (time.perf_counter() - self._wall0) * 1000
+        self.cpu_ms = (time.thread_time() - self._cpu0) * 1000
+        self._stop.set()
+        self._sampler.join()
+
+    def _sample(self):
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            frames.reverse()
+            # Root each stack at the active stage so the flamegraph groups by stage
+            prefix = ['[' + '/'.join(self.stage_path) + ']'] if self.stage_path else []
+            self.stacks[';'.join(prefix + frames)] += 1
+
+    def summary(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'started': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started)),
+            'wallMs': round(self.wall_ms, 2),
+            'cpuMs': round(self.cpu_ms, 2),
+            'waitMs': round(self.wall_ms - self.cpu_ms, 2),
+            'samples': sum(self.stacks.values()),
+            'sampleIntervalMs': SAMPLE_INTERVAL * 1000,
+            'stages': self.stages
+        }
+
+    def save(self, directory=PROFILE_DIR):
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{self.id}.collapsed"), 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(os.path.join(directory, f"{self.id}.json"), 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+        prune_profiles(directory)
+
+
+@contextmanager
+def stage(name):
+    """Time a block as a named stage of the current profiled request.
+
+    A no-op when the current thread is not being profiled.
+    """
+    profile = getattr(_local, 'profile', None)
+    if profile is None:
+        yield
+        return
+    profile.stage_path.append(name)
+    path = '/'.join(profile.stage_path)
+    wall0 = time.perf_counter()
+    cpu0 = time.thread_time()
+    try:
+        yield
+    finally:
+        wall = (time.perf_counter() - wall0) * 1000
+        cpu = (time.thread_time() - cpu0) * 1000
+        profile.stage_path.pop()
+        profile.stages.append({
+            'stage': path,
+            'wallMs': round(wall, 2),
+            'cpuMs': round(cpu, 2),
+            'waitMs': round(wall - cpu, 2)
+        })
+
+
+def start_profile(name):
+    profile = RequestProfile(name)
+    _local.profile = profile
+    profile.start()
+    return profile
+
+
+def finish_profile():
+    """Stop and save the current thread's profile, if any"""
+    profile = getattr(_local, 'profile', None)
+    if profile is None:
+        return None
+    _local.profile = None
+    profile.stop()
+    try:
+        profile.save()
+    except Exception as e:
+        print(f"Error saving profile {profile.id}: {e}")
+    return profile
+
+
+def current_profile():
+    return getattr(_local, 'profile', None)
+
+
+def prune_profiles(directory=PROFILE_DIR, keep=MAX_PROFILES):
+    """Delete all but the most recent ``keep`` profiles"""
+    summaries = sorted(
+        (f for f in os.listdir(directory) if f.endswith('.json')),
+        key=lambda f: os.path.getmtime(os.path.join(directory, f)),
+        reverse=True
+    )
+    for old in summaries[keep:]:
+        profile_id = old[:-len('.json')]
+        for ext in ('.json', '.collapsed'):
+            try:
+                os.remove(os.path.join(directory, profile_id + ext))
+            except OSError:
+                pass
+
+
+def list_profiles(directory=PROFILE_DIR, limit=20):
+    """Summaries of the most recent profiles, newest first"""
+    if not os.path.isdir(directory):
+        return []
+    summaries = sorted(
+        (f for f in os.listdir(directory) if f.endswith('.json')),
+        key=lambda f: os.path.getmtime(os.path.join(directory, f)),
+        reverse=True
+    )
+    results = []
+    for name in summaries[:limit]:
+        try:
+            with open(os.path.join(directory, name)) as f:
+                summary = json.load(f)
+            summary.pop('stages', None)
+            results.append(summary)
+        except (OSError, ValueError):
+            continue
+    return results
+
+
+def init_app(app):
+    """Register request hooks that start and save profiles"""
+    from flask import request
+
+    @app.before_request
+    def _start_profile():
+        if wants_profile(request):
+            name = (request.endpoint or 'request').replace('.', '_')
+            if request.view_args and 'ticker' in request.view_args:
+                name += '-' + request.view_args['ticker'].upper()
+            start_profile(name)
+
+    @app.after_request
+    def _tag_profile(response):
+        profile = current_profile()
+        if profile is not None:
+            response.headers['X-Profile-Id'] = profile.id
+        return response
+
+    @app.teardown_request
+    def _finish_profile(exc):
+        finish_profile()
@@ -0,0 +1,248 @@
+"""Live quote hub: one batched upstream poll, fanned out to every viewer.
+
+Each worker process reference-counts the tickers its connected clients are
+watching and publishes them to the shared cache. Every POLL_INTERVAL
+seconds the holder of the ``quote-poller`` lease fetches every ticker any
+worker is watching in a single batched yfinance call and publishes the
+quotes to the shared cache. Each worker then pushes only the quotes that
+changed to its interested clients' queues, which the SSE endpoint streams to
+the browser. Upstream traffic scales with unique tickers, not with viewers
+or worker processes.
+
+Every open stream holds a server thread, so a worker accepts at most
+MAX_STREAMS of them and each stream ends after STREAM_SECONDS; the browser
+reconnects, possibly to a less busy worker.
+"""
+import os
+import time
+import queue
+import threading
+from collections import Counter
+
+import watchlist
+from admission import Overloaded
+from cache import Lease, MISS, shared_cache
+from lazy import lazy_import
+
+yf = lazy_import('yfinance')
+pd = lazy_import('pandas')
+
+POLL_INTERVAL = float(os.environ.get('TREASURYPRO_QUOTE_POLL', '15'))  # seconds
+MAX_TICKERS_PER_CLIENT = 50
+CLIENT_QUEUE_SIZE = 100
+# Open streams per worker process; the rest of its threads stay free for requests
+MAX_STREAMS = int(os.environ.get(
+    'TREASURYPRO_QUOTE_STREAMS', str(max(1, int(os.environ.get('TREASURYPRO_THREADS', '16')) // 4))
+))
+STREAM_SECONDS = int(os.environ.get('TREASURYPRO_QUOTE_STREAM_SECONDS', '300'))
+WATCHED_KEY = 'quotes:watched'
+LATEST_KEY = 'quotes:latest'
+
+
+def fetch_quotes(tickers):
+    """Latest price and change vs previous close for many tickers in one call"""
+    data = yf.download(
+        ' '.join(tickers), period='5d', interval='1d', group_by='ticker',
+        auto_adjust=False, progress=False, threads=False
+    )
+    quotes = {}
+    if data is None or data.empty:
+        return quotes
+    now = int(time.time())
+    for ticker in tickers:
+        try:
+            frame = data[ticker] if isinstance(data.columns, pd.MultiIndex) else data
+            closes = frame['Close'].dropna()
+        except KeyError:
+            continue
+        if closes.empty:
+            continue
+        price = float(closes.iloc[-1])
+        previous_close = float(closes.iloc[-2]) if len(closes) > 1 else price
+        change = price - previous_close
+        quotes[ticker] = {
+            'symbol': ticker,
+            'price': price,
+            'change': change,
+            'changePercent': (change / previous_close * 100) if previous_close > 0 else 0,
+            'time': now
+        }
+    return quotes
+
+
+class QuoteClient:
+    """One connected viewer: the tickers it watches and its outbound queue"""
+
+    def __init__(self, tickers):
+        self.tickers = set(tickers)
+        self.queue = queue.Queue(maxsize=CLIENT_QUEUE_SIZE)
+
+    def send(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            # A stalled client shouldn't block everyone else; drop its oldest update
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.queue.put_nowait(message)
+
+
+class QuoteHub:
+    """Reference-counted subscriptions plus a single batched poller across workers"""
+
+    def __init__(self, fetch=fetch_quotes, interval=POLL_INTERVAL, max_streams=MAX_STREAMS):
+        self.fetch = fetch
+        self.interval = interval
+        self.max_streams = max_streams
+        self.subscriptions = Counter()
+        self.clients = set()
+        self.quotes = {}
+        self.upstream_calls = 0
+        self.rejected = 0
+        self.lease = Lease('quote-poller', interval * 3)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def subscribe(self, tickers):
+        """A new client for ``tickers``; raises Overloaded when this worker has MAX_STREAMS open.
+
+        Invalid symbols are dropped, so they never reach the shared watched set.
+        """
+        tickers = [t.upper() for t in tickers if watchlist.valid(t)][:MAX_TICKERS_PER_CLIENT]
+        client = QuoteClient(tickers)
+        with self._lock:
+            if len(self.clients) >= self.max_streams:
+                self.rejected += 1
+                raise Overloaded(max(5, int(self.interval)), 'quote streams full')
+            self.clients.add(client)
+            self.subscriptions.update(client.tickers)
+            snapshot = {t: self.quotes[t] for t in client.tickers if t in self.quotes}
+            new = [t for t in client.tickers if t not in self.quotes]
+        if snapshot:
+            client.send({'quotes': snapshot})
+        self.start()
+        if new:
+            # Don't make a new viewer wait a full interval for its first quote
+            self._wake.set()
+        return client
+
+    def unsubscribe(self, client):
+        with self._lock:
+            if client not in self.clients:
+                return
+            self.clients.discard(client)
+            self.subscriptions.subtract(client.tickers)
+            for ticker in [t for t, n in self.subscriptions.items() if n <= 0]:
+                del self.subscriptions[ticker]
+
+    def watched(self):
+        with self._lock:
+            return sorted(self.subscriptions)
+
+    def publish_watched(self):
+        """Merge this worker's tickers into the shared watch list; returns every live ticker"""
+        now = time.time()
+        shared = shared_cache.get(WATCHED_KEY, fresh=True)
+        shared = {} if shared is MISS else {t: until for t, until in shared.items() if until > now}
+        mine = self.watched()
+        if mine:
+            # Entries outlive a few missed rounds, then lapse when this worker stops watching
+            shared.update({t: now + self.interval * 3 for t in mine})
+            shared_cache.set(WATCHED_KEY, shared, self.interval * 3)
+        return sorted(shared)
+
+    def quote(self, ticker):
+        """Latest polled quote for a ticker any worker is streaming, or None"""
+        latest = shared_cache.get(LATEST_KEY, fresh=True)
+        return None if latest is MISS else latest.get(ticker.upper())
+
+    def _fetch(self, tickers):
+        self.upstream_calls += 1
+        try:
+            return self.fetch(tickers)
+        except Exception as e:
+            print(f"Quote poll error: {e}")
+            return {}
+
+    def _store(self, fresh, keep):
+        """Merge fetched quotes into the shared latest quotes, keeping only ``keep`` tickers"""
+        latest = shared_cache.get(LATEST_KEY, fresh=True)
+        latest = {} if latest is MISS else latest
+        latest.update(fresh)
+        latest = {t: q for t, q in latest.items() if t in keep}
+        shared_cache.set(LATEST_KEY, latest, self.interval * 10)
+        return latest
+
+    def deliver(self, latest):
+        """Push quotes that changed since the last delivery to this worker's viewers"""
+        with self._lock:
+            changed = {
+                t: q for t, q in latest.items()
+                if t in self.subscriptions and (
+                    t not in self.quotes
+                    or (self.quotes[t]['price'], self.quotes[t]['change']) != (q['price'], q['change'])
+                )
+            }
+            self.quotes.update(changed)
+            clients = list(self.clients)
+        if changed:
+            for client in clients:
+                update = {t: q for t, q in changed.items() if t in client.tickers}
+                if update:
+                    client.send({'quotes': update})
+        return len(changed)
+
+    def poll_once(self):
+        """One round: publish our tickers, poll upstream if we hold the lease, deliver changes"""
+        watched = self.publish_watched()
+        if not watched:
+            return 0
+        mine = self.watched()
+        if self.lease.acquire():
+            latest = self._store(self._fetch(watched), set(watched))
+        else:
+            latest = shared_cache.get(LATEST_KEY, fresh=True)
+            latest = {} if latest is MISS else latest
+            missing = [t for t in mine if t not in latest]
+            if missing:
+                # First viewer of a ticker: fetch just those rather than wait for the poller
+                latest = self._store(self._fetch(missing), set(watched) | set(missing))
+        return self.deliver(latest)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='quote-hub', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"Quote hub error: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def stats(self):
+        holder = self.lease.holder()
+        with self._lock:
+            return {
+                'clients': len(self.clients),
+                'maxStreams': self.max_streams,
+                'rejectedStreams': self.rejected,
+                'uniqueTickers': len(self.subscriptions),
+                'upstreamCalls': self.upstream_calls,
+                'pollerLeader': holder,
+                'isLeader': holder == Lease.owner(),
+                'pollIntervalSeconds': self.interval
+            }
+
+
+quote_hub = QuoteHub()
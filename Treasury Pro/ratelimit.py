@@ -0,0 +1,50 @@
+"""Token bucket for budgeting upstream requests across threads.
+
+Batch jobs (warmup.py) create one bucket and hand it to market_data, so every
+Yahoo Finance request they trigger, from any worker thread, draws from the
+same budget. Interactive requests never wait on a bucket.
+"""
+import time
+import threading
+
+
+class TokenBucket:
+    """``rate`` tokens per second, bursting up to ``burst``"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1, rate))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.waited = 0.0
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens=1):
+        """Block until ``tokens`` are available; returns the seconds waited"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    self.acquired += tokens
+                    self.waited += waited
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def stats(self):
+        with self._lock:
+            return {
+                'ratePerSecond': self.rate,
+                'burst': self.burst,
+                'acquired': self.acquired,
+                'waitedSeconds': round(self.waited, 2)
+            }
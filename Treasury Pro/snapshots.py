@@ -0,0 +1,80 @@
+"""Versioned snapshots of the /api/stock document for delta refreshes.
+
+The document is split into sections (SECTIONS groups of top-level keys; any
+other key is a section of its own) and each section gets a content hash.
+The snapshot version is a hash of those section hashes, so every worker on
+every node derives the same version for the same content without
+coordinating. The section hashes and top-level keys of each version are kept
+in the shared cache for SNAPSHOT_TTL. A client that sends the version it already has gets
+back only the sections whose hash changed, usually just ``quote``.
+"""
+import json
+import hashlib
+
+from cache import MISS, shared_cache
+
+SNAPSHOT_TTL = 24 * 60 * 60
+
+# section: top-level keys of the stock document it covers
+SECTIONS = {
+    'quote': ['symbol', 'companyName', 'price', 'change', 'changePercent', 'timestamp', 'frequency'],
+    'overview': [
+        'marketCap', 'peRatio', 'eps', 'debtToEquity', 'currentRatio', 'quickRatio', 'roe',
+        'grossMargin', 'operatingMargin', 'netMargin', 'assetTurnover', 'inventoryTurnover',
+        'receivablesTurnover', 'high52', 'low52', 'beta', 'dividendYield', 'volume', 'avgVolume',
+        'revenue', 'netIncome', 'totalAssets', 'totalLiabilities', 'shareholdersEquity',
+        'freeCashFlow', 'avgReturn3yr', 'riskFreeRate', 'returnStdDev', 'sharpeRatio'
+    ],
+    'industry': ['sector', 'industry', 'tariffInfo']
+}
+_SECTION_OF = {key: section for section, keys in SECTIONS.items() for key in keys}
+
+
+def _digest(value):
+    text = json.dumps(value, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]
+
+
+def split(document):
+    """{section: {key: value}} for a stock document"""
+    sections = {}
+    for key, value in document.items():
+        sections.setdefault(_SECTION_OF.get(key, key), {})[key] = value
+    return sections
+
+
+def snapshot(ticker, document):
+    """(version, sections, section hashes); records the version in the shared cache"""
+    sections = split(document)
+    hashes = {name: _digest(content) for name, content in sections.items()}
+    version = _digest(hashes)
+    key = f"snapshot:{ticker.upper()}:{version}"
+    if shared_cache.get(key) is MISS:
+        shared_cache.set(key, {'hashes': hashes, 'keys': sorted(document)}, SNAPSHOT_TTL)
+    return version, sections, hashes
+
+
+def respond(ticker, document, since=None):
+    """The payload for a client that has version ``since`` (None for a first load).
+
+    Full document plus ``version`` when the client has nothing or an expired
+    version; otherwise ``{'delta': True, 'sections': {changed sections},
+    'removed': [top-level keys]}``, which is empty when nothing changed.
+    The client merges the changed sections and deletes the removed keys.
+    """
+    version, sections, hashes = snapshot(ticker, document)
+    previous = shared_cache.get(f"snapshot:{ticker.upper()}:{since}") if since else MISS
+    if not isinstance(previous, dict) or set(previous) != {'hashes', 'keys'}:
+        return dict(document, version=version)  # unknown, expired or old format
+    changed = {
+        name: sections[name] for name, digest in hashes.items() if previous['hashes'].get(name) != digest
+    }
+    removed = [key for key in previous['keys'] if key not in document]
+    return {
+        'symbol': ticker.upper(),
+        'version': version,
+        'since': since,
+        'delta': True,
+        'sections': changed,
+        'removed': removed
+    }
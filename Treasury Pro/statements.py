@@ -0,0 +1,292 @@
+"""Canonical financial statement line items.
+
+Yahoo Finance row labels vary between companies and over time ('Total Debt'
+vs 'Long Term Debt', 'Total Liabilities Net Minority Interest' vs 'Total
+Liabilities', ...). CANONICAL_ITEMS lists, once, the raw labels that can
+supply each canonical item in priority order. ``normalize`` maps a company's
+raw statements to those items in one vectorized pass, and every normalized
+statement is also kept per (ticker, frequency) for cross-sectional queries
+across tickers.
+
+Quarterly statements normalize the same way. Trailing-twelve-month (TTM)
+values are rolled forward one quarter at a time by TTMRollup, so each new
+quarter costs one add and one subtract instead of re-summing history.
+"""
+import os
+import threading
+from collections import OrderedDict, deque
+
+from lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# Which yfinance attribute holds each statement
+STATEMENT_ATTRS = {
+    'income': 'financials',
+    'balance': 'balance_sheet',
+    'cashflow': 'cashflow'
+}
+QUARTERLY_STATEMENT_ATTRS = {
+    'income': 'quarterly_financials',
+    'balance': 'quarterly_balance_sheet',
+    'cashflow': 'quarterly_cashflow'
+}
+
+FREQUENCIES = ('annual', 'quarterly', 'ttm')
+# (ticker, frequency) statements kept for cross-sectional queries per process
+TABLE_MAX_STATEMENTS = int(os.environ.get('TREASURYPRO_STATEMENT_TABLE_MAX', '2000'))
+# Income and cash flow items are flows (TTM = sum of 4 quarters); balance items are point in time
+FLOW_STATEMENTS = ('income', 'cashflow')
+
+# canonical item: (statement, raw labels in priority order)
+CANONICAL_ITEMS = {
+    'revenue': ('income', ['Total Revenue', 'Operating Revenue']),
+    'cost_of_revenue': ('income', ['Cost Of Revenue', 'Reconciled Cost Of Revenue']),
+    'gross_profit': ('income', ['Gross Profit']),
+    'operating_income': ('income', ['Operating Income', 'Total Operating Income As Reported']),
+    'ebitda': ('income', ['EBITDA', 'Normalized EBITDA']),
+    'interest_expense': ('income', ['Interest Expense', 'Interest Expense Non Operating']),
+    'net_income': ('income', ['Net Income', 'Net Income Common Stockholders']),
+    'diluted_eps': ('income', ['Diluted EPS', 'Basic EPS']),
+    'total_assets': ('balance', ['Total Assets']),
+    'current_assets': ('balance', ['Current Assets']),
+    'cash': ('balance', ['Cash And Cash Equivalents', 'Cash Cash Equivalents And Short Term Investments']),
+    'inventory': ('balance', ['Inventory']),
+    'receivables': ('balance', ['Accounts Receivable', 'Receivables']),
+    'total_liabilities': ('balance', ['Total Liabilities Net Minority Interest', 'Total Liabilities']),
+    'current_liabilities': ('balance', ['Current Liabilities']),
+    'total_debt': ('balance', ['Total Debt', 'Long Term Debt']),
+    'stockholders_equity': ('balance', ['Stockholders Equity', 'Common Stock Equity', 'Total Equity Gross Minority Interest']),
+    'shares_outstanding': ('balance', ['Ordinary Shares Number', 'Share Issued']),
+    'operating_cash_flow': ('cashflow', ['Operating Cash Flow', 'Cash Flow From Continuing Operating Activities']),
+    'capital_expenditure': ('cashflow', ['Capital Expenditure']),
+    'free_cash_flow': ('cashflow', ['Free Cash Flow']),
+    'dividends_paid': ('cashflow', ['Cash Dividends Paid', 'Common Stock Dividend Paid'])
+}
+
+ITEMS = list(CANONICAL_ITEMS)
+FLOW_ITEMS = [item for item, (stmt, _) in CANONICAL_ITEMS.items() if stmt in FLOW_STATEMENTS]
+
+
+def _derive(values):
+    """Fill canonical items that can be computed from others (arrays by item name)"""
+    # CapEx is reported negative, and a missing CapEx line counts as zero
+    fcf = values['free_cash_flow']
+    derived = values['operating_cash_flow'] + np.nan_to_num(values['capital_expenditure'])
+    values['free_cash_flow'] = np.where(np.isnan(fcf), derived, fcf)
+    gp = values['gross_profit']
+    values['gross_profit'] = np.where(np.isnan(gp), values['revenue'] - values['cost_of_revenue'], gp)
+
+
+def normalize(statements):
+    """Map raw yfinance statements to canonical items.
+
+    ``statements`` maps 'income'/'balance'/'cashflow' to raw DataFrames
+    (row labels x period columns). Returns a DataFrame of canonical items x
+    periods, newest period first, NaN where no source label has a value.
+    """
+    frames = [df for df in statements.values() if df is not None and not df.empty]
+    if not frames:
+        return pd.DataFrame(index=ITEMS, dtype='float64')
+    periods = sorted(set().union(*(df.columns for df in frames)), reverse=True)
+    depth = max(len(labels) for _, labels in CANONICAL_ITEMS.values())
+
+    # (item, alternative label, period) cube, NaN-padded where an item has fewer labels
+    cube = np.full((len(ITEMS), depth, len(periods)), np.nan)
+    for kind, df in statements.items():
+        if df is None or df.empty:
+            continue
+        rows = [(i, k, label) for i, (item, (stmt, labels)) in enumerate(CANONICAL_ITEMS.items())
+                if stmt == kind for k, label in enumerate(labels)]
+        block = df.reindex(index=[label for _, _, label in rows], columns=periods)
+        block = block.apply(pd.to_numeric, errors='coerce').to_numpy(dtype='float64')
+        cube[[i for i, _, _ in rows], [k for _, k, _ in rows]] = block
+
+    # First label with a value wins, for every item and period at once
+    has_value = ~np.isnan(cube)
+    first = np.argmax(has_value, axis=1)
+    values = np.take_along_axis(cube, first[:, None, :], axis=1)[:, 0, :]
+
+    by_item = dict(zip(ITEMS, values))
+    _derive(by_item)
+    return pd.DataFrame([by_item[item] for item in ITEMS], index=ITEMS, columns=pd.DatetimeIndex(periods))
+
+
+def latest(normalized, item, default=0):
+    """Most recent non-missing value of an item"""
+    if item not in normalized.index:
+        return default
+    series = normalized.loc[item].dropna()
+    return float(series.iloc[0]) if len(series) else default
+
+
+def series(normalized, item, limit=5):
+    """[(period, value)] for the ``limit`` most recent periods, newest first, skipping NaN"""
+    if item not in normalized.index:
+        return []
+    values = normalized.loc[item].iloc[:limit].dropna()
+    return list(zip(values.index, values.astype(float)))
+
+
+def period_label(period, frequency='annual'):
+    """'2024' for annual periods, 'Dec 2024' (period end) for quarterly and TTM"""
+    return period.strftime('%Y') if frequency == 'annual' else period.strftime('%b %Y')
+
+
+def statement_frame(normalized, kind):
+    """Canonical items belonging to one statement (for downloads)"""
+    items = [item for item, (stmt, _) in CANONICAL_ITEMS.items() if stmt == kind]
+    return normalized.loc[items]
+
+
+class TTMRollup:
+    """Trailing-twelve-month values for one ticker, rolled forward a quarter at a time.
+
+    Flow items are the sum of the last four quarters, kept as a running sum
+    (plus a count of non-missing quarters, so an item is only reported once
+    all four are present); balance sheet items take the latest quarter. TTM
+    points are kept after Yahoo stops returning their quarters, so history
+    grows as quarters arrive. Serializable with to_dict/from_dict.
+    """
+
+    # A gap longer than this between quarters restarts the window
+    MAX_GAP_DAYS = 120
+
+    def __init__(self):
+        self.window = deque()
+        self.sums = np.zeros(len(ITEMS))
+        self.counts = np.zeros(len(ITEMS), dtype='int64')
+        self.last_period = None
+        self.history = {}
+
+    @staticmethod
+    def _flow_mask():
+        return np.array([item in FLOW_ITEMS for item in ITEMS])
+
+    def add(self, period, values):
+        """Roll in one quarter (values in ITEMS order); returns False if it isn't newer"""
+        period = pd.Timestamp(period)
+        if self.last_period is not None:
+            if period <= self.last_period:
+                return False
+            if (period - self.last_period).days > self.MAX_GAP_DAYS:
+                self.window.clear()
+                self.sums[:] = 0
+                self.counts[:] = 0
+        values = np.asarray(values, dtype='float64')
+        if len(self.window) == 4:
+            old = self.window.popleft()
+            self.sums -= np.nan_to_num(old)
+            self.counts -= ~np.isnan(old)
+        self.window.append(values)
+        self.sums += np.nan_to_num(values)
+        self.counts += ~np.isnan(values)
+        ttm = np.where(self._flow_mask(), np.where(self.counts == 4, self.sums, np.nan), values)
+        self.history[period] = ttm
+        self.last_period = period
+        return True
+
+    def update(self, quarterly):
+        """Roll in every quarter of a normalized quarterly frame newer than the last seen"""
+        quarterly = quarterly.reindex(ITEMS)
+        return sum(self.add(period, quarterly[period].to_numpy()) for period in sorted(quarterly.columns))
+
+    def frame(self):
+        """Canonical items x TTM periods, newest first"""
+        periods = sorted(self.history, reverse=True)
+        if not periods:
+            return pd.DataFrame(index=ITEMS, dtype='float64')
+        values = np.column_stack([self.history[p] for p in periods])
+        return pd.DataFrame(values, index=ITEMS, columns=pd.DatetimeIndex(periods))
+
+    def to_dict(self):
+        def plain(values):
+            return [None if np.isnan(v) else float(v) for v in values]
+        return {
+            'items': ITEMS,
+            'window': [plain(v) for v in self.window],
+            'lastPeriod': self.last_period.isoformat() if self.last_period is not None else None,
+            'history': {p.isoformat(): plain(v) for p, v in self.history.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        rollup = cls()
+        if not data or data.get('items') != ITEMS:
+            return rollup
+        def array(values):
+            return np.array([np.nan if v is None else v for v in values], dtype='float64')
+        rollup.window = deque(array(v) for v in data['window'])
+        for values in rollup.window:
+            rollup.sums += np.nan_to_num(values)
+            rollup.counts += ~np.isnan(values)
+        rollup.last_period = pd.Timestamp(data['lastPeriod']) if data['lastPeriod'] else None
+        rollup.history = {pd.Timestamp(p): array(v) for p, v in data['history'].items()}
+        return rollup
+
+
+class StatementTable:
+    """Normalized statements across tickers, for cross-sectional queries.
+
+    Each (ticker, frequency) statement is kept as its own block, so an update
+    replaces one dict entry; queries assemble only the item they ask for.
+    Beyond ``max_statements`` the least recently changed block is dropped.
+    """
+
+    def __init__(self, max_statements=TABLE_MAX_STATEMENTS):
+        self.max_statements = max_statements
+        self._lock = threading.Lock()
+        self._blocks = OrderedDict()
+
+    def upsert(self, ticker, normalized, frequency='annual'):
+        """Replace a ticker's statement; a no-op when it hasn't changed"""
+        key = (ticker.upper(), frequency)
+        with self._lock:
+            current = self._blocks.get(key)
+            if current is not None and (current is normalized or current.equals(normalized)):
+                return
+            self._blocks[key] = normalized
+            self._blocks.move_to_end(key)
+            while len(self._blocks) > self.max_statements:
+                self._blocks.popitem(last=False)
+
+    def tickers(self, frequency='annual'):
+        with self._lock:
+            return sorted(t for t, f in self._blocks if f == frequency)
+
+    def cross_section(self, item, tickers=None, periods=5, frequency='annual'):
+        """DataFrame of tickers x periods (newest first) for one item"""
+        wanted = {t.upper() for t in tickers} if tickers else None
+        with self._lock:
+            blocks = [(t, n) for (t, f), n in self._blocks.items()
+                      if f == frequency and (wanted is None or t in wanted)]
+        rows = {}
+        for ticker, normalized in blocks:
+            if item not in normalized.index:
+                continue
+            values = normalized.loc[item].dropna()
+            if values.empty:
+                continue
+            periods_index = pd.DatetimeIndex(values.index)
+            values.index = periods_index.year.astype(str) if frequency == 'annual' else periods_index.strftime('%Y-%m-%d')
+            # Newest first, so the latest period wins when two share a label
+            rows[ticker] = values[~values.index.duplicated()]
+        if not rows:
+            return pd.DataFrame()
+        wide = pd.DataFrame(rows).T.sort_index()
+        wide.index.name, wide.columns.name = 'ticker', 'label'
+        return wide[sorted(wide.columns, reverse=True)[:periods]]
+
+    def growth(self, item, tickers=None, periods=5, frequency='annual'):
+        """Period-over-period growth (%) for one item across tickers"""
+        wide = self.cross_section(item, tickers, periods + 1, frequency)
+        if wide.empty:
+            return wide
+        ordered = wide[sorted(wide.columns)]
+        prev = ordered.shift(1, axis=1)
+        growth = (ordered - prev) / prev.abs() * 100
+        return growth[sorted(growth.columns, reverse=True)[:periods]]
+
+
+statement_table = StatementTable()
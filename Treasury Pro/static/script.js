@@ -55,15 +55,27 @@ let currentTicker = '';
 
 // Fetch stock data
 async function fetchStockData(ticker) {
+    // Reloading the ticker on screen only asks for what changed since our version
+    const refresh = Boolean(currentData && currentData.version && currentData.symbol === ticker.toUpperCase());
     try {
-        showLoading(true);
         hideError();
-        mainContent.classList.add('hidden');
+        if (!refresh) {
+            showLoading(true);
+            mainContent.classList.add('hidden');
+        }
         
         // Store ticker globally for downloads
         currentTicker = ticker.toUpperCase();
         
-        const response = await fetch(`/api/stock/${ticker}`);
+        const url = refresh
+            ? `/api/stock/${ticker}?since=${currentData.version}&frequency=${document.getElementById('trendFrequency').value}`
+            : `/api/stock/${ticker}`;
+        const response = await fetch(url);
+        
+        if (response.status === 503) {
+            const retryAfter = response.headers.get('Retry-After') || '30';
+            throw new Error(`Server is busy analysing other stocks. Please try again in ${retryAfter} seconds.`);
+        }
         
         if (!response.ok) {
             throw new Error('Failed to fetch stock data');
@@ -75,8 +87,15 @@ async function fetchStockData(ticker) {
             throw new Error(data.error);
         }
         
-        currentData = data;
-        updateDashboard(data);
+        if (data.delta) {
+            applyDelta(data);
+        } else {
+            currentData = data;
+            updateDashboard(data);
+        }
+        if (!refresh) {
+            subscribeQuotes(currentTicker);
+        }
         
         showLoading(false);
         mainContent.classList.remove('hidden');
@@ -88,56 +107,107 @@ async function fetchStockData(ticker) {
     }
 }
 
-// Update dashboard with data
-function updateDashboard(data) {
-    // Company header
-    document.getElementById('companyName').textContent = data.companyName || data.symbol;
-    document.getElementById('companyInfo').textContent = `${data.sector} | ${data.industry}`;
-    document.getElementById('price').textContent = formatCurrency(data.price);
+// Live quote stream for the ticker on screen
+let quoteStream = null;
+
+function subscribeQuotes(ticker) {
+    if (quoteStream) {
+        quoteStream.close();
+        quoteStream = null;
+    }
+    if (!window.EventSource) {
+        return;
+    }
+    
+    quoteStream = new EventSource(`/api/quotes/stream?tickers=${encodeURIComponent(ticker)}`);
+    quoteStream.addEventListener('quote', (e) => {
+        const update = JSON.parse(e.data);
+        const quote = update.quotes && update.quotes[currentTicker];
+        if (quote && currentData) {
+            currentData.price = quote.price;
+            currentData.change = quote.change;
+            currentData.changePercent = quote.changePercent;
+            displayQuote(quote);
+        }
+    });
+    // A worker at its stream limit answers 503, which EventSource doesn't retry
+    const stream = quoteStream;
+    stream.onerror = () => {
+        if (stream.readyState === EventSource.CLOSED) {
+            setTimeout(() => {
+                if (quoteStream === stream && currentTicker === ticker) {
+                    subscribeQuotes(ticker);
+                }
+            }, 30000);
+        }
+    };
+}
+
+// Price and daily change in the company header
+function displayQuote(quote) {
+    document.getElementById('price').textContent = formatCurrency(quote.price);
     
     const changeEl = document.getElementById('change');
-    const changeText = `${data.change >= 0 ? '+' : ''}${formatNumber(data.change, 2)} (${data.changePercent >= 0 ? '+' : ''}${formatNumber(data.changePercent, 2)}%)`;
+    const changeText = `${quote.change >= 0 ? '+' : ''}${formatNumber(quote.change, 2)} (${quote.changePercent >= 0 ? '+' : ''}${formatNumber(quote.changePercent, 2)}%)`;
     changeEl.textContent = changeText;
-    changeEl.className = `change ${data.changePercent >= 0 ? 'positive' : 'negative'}`;
-    
-    // Overview tab
-    document.getElementById('marketCap').textContent = formatLargeNumber(data.marketCap);
-    document.getElementById('peRatio').textContent = formatNumber(data.peRatio, 2);
-    document.getElementById('eps').textContent = formatCurrency(data.eps);
-    document.getElementById('beta').textContent = formatNumber(data.beta, 2);
-    document.getElementById('dividendYield').textContent = formatPercent(data.dividendYield);
-    document.getElementById('high52').textContent = formatCurrency(data.high52);
-    document.getElementById('low52').textContent = formatCurrency(data.low52);
-    document.getElementById('volume').textContent = formatVolume(data.volume);
-    document.getElementById('avgVolume').textContent = formatVolume(data.avgVolume);
-    document.getElementById('sharpeRatio').textContent = formatNumber(data.sharpeRatio, 2);
-    
-    // Display initial ratios
-    displayRatios(data, 'valuation');
-    
-    // Display trends
-    displayTrends(data.trends);
-    
-    // Display peer comparison
-    displayPeerComparison(data.peerComparison);
-    
-    // Display red flags
-    displayRedFlags(data.redFlags);
-    
-    // Display industry info
-    document.getElementById('sector').textContent = data.sector;
-    document.getElementById('industryName').textContent = data.industry;
-    displayIndustryAnalysis(data);
-    
-    // Display events and transcripts
-    displayEvents(data.events);
-    displayTranscriptLinks(data.transcriptLinks);
-    
-    // Display news in overview
-    displayNews(data.news);
-    
-    // Display interest rates
-    displayInterestRates(data.interestRates);
+    changeEl.className = `change ${quote.changePercent >= 0 ? 'positive' : 'negative'}`;
+}
+
+// Renderers for each section of the stock document (see snapshots.py)
+const sectionRenderers = {
+    quote: (data) => {
+        document.getElementById('companyName').textContent = data.companyName || data.symbol;
+        displayQuote(data);
+    },
+    industry: (data) => {
+        document.getElementById('companyInfo').textContent = `${data.sector} | ${data.industry}`;
+        document.getElementById('sector').textContent = data.sector;
+        document.getElementById('industryName').textContent = data.industry;
+    },
+    overview: (data) => {
+        document.getElementById('marketCap').textContent = formatLargeNumber(data.marketCap);
+        document.getElementById('peRatio').textContent = formatNumber(data.peRatio, 2);
+        document.getElementById('eps').textContent = formatCurrency(data.eps);
+        document.getElementById('beta').textContent = formatNumber(data.beta, 2);
+        document.getElementById('dividendYield').textContent = formatPercent(data.dividendYield);
+        document.getElementById('high52').textContent = formatCurrency(data.high52);
+        document.getElementById('low52').textContent = formatCurrency(data.low52);
+        document.getElementById('volume').textContent = formatVolume(data.volume);
+        document.getElementById('avgVolume').textContent = formatVolume(data.avgVolume);
+        document.getElementById('sharpeRatio').textContent = formatNumber(data.sharpeRatio, 2);
+        const ratioCategory = document.getElementById('ratioCategory');
+        displayRatios(data, ratioCategory ? ratioCategory.value : 'valuation');
+        displayIndustryAnalysis(data);
+    },
+    trends: (data) => {
+        document.getElementById('trendFrequency').value = data.frequency || 'annual';
+        displayTrends(data.trends);
+    },
+    peerComparison: (data) => {
+        displayPeerComparison(data.peerComparison);
+        displayIndustryAnalysis(data);
+    },
+    redFlags: (data) => displayRedFlags(data.redFlags),
+    events: (data) => displayEvents(data.events),
+    transcriptLinks: (data) => displayTranscriptLinks(data.transcriptLinks),
+    news: (data) => displayNews(data.news),
+    interestRates: (data) => displayInterestRates(data.interestRates)
+};
+
+// Update dashboard with data
+function updateDashboard(data) {
+    Object.values(sectionRenderers).forEach(render => render(data));
+}
+
+// Merge a delta response into currentData and re-render only the changed sections
+function applyDelta(delta) {
+    (delta.removed || []).forEach(key => delete currentData[key]);
+    Object.values(delta.sections).forEach(section => Object.assign(currentData, section));
+    currentData.version = delta.version;
+    Object.keys(delta.sections).forEach(name => {
+        const render = sectionRenderers[name];
+        if (render) render(currentData);
+    });
 }
 
 // Display news with proper formatting
@@ -376,6 +446,21 @@ function displayRatios(data, category) {
     content.innerHTML = html;
 }
 
+// Reload trends and red flags for another statement frequency
+async function changeTrendFrequency() {
+    if (!currentTicker) return;
+    const frequency = document.getElementById('trendFrequency').value;
+    try {
+        const response = await fetch(`/api/stock/${currentTicker}/trends?frequency=${frequency}`);
+        const data = await response.json();
+        if (!response.ok) throw new Error(data.error || 'Failed to load trends');
+        displayTrends(data.trends);
+        displayRedFlags(data.redFlags);
+    } catch (error) {
+        console.error('Trend frequency error:', error);
+    }
+}
+
 // Display trends
 function displayTrends(trends) {
     displayTrendData('fcfTrend', trends.freeCashFlow, 'Free Cash Flow');
@@ -670,6 +755,7 @@ function downloadFinancials() {
     
     const statementType = document.getElementById('statementType').value;
     const format = document.getElementById('fileFormat').value;
+    const frequency = document.getElementById('statementFrequency').value;
     
     // Get selected years
     const selectedYears = [];
@@ -684,7 +770,7 @@ function downloadFinancials() {
     
     // Build URL with selected years as comma-separated string
     const yearsParam = selectedYears.join(',');
-    const url = `/download/financials/${currentTicker}?type=${statementType}&years=${yearsParam}&format=${format}`;
+    const url = `/download/financials/${currentTicker}?type=${statementType}&years=${yearsParam}&format=${format}&frequency=${frequency}`;
     
     // Trigger download
     window.location.href = url;
@@ -0,0 +1,40 @@
+"""Startup guard: importing the app must stay fast and must not load heavy modules.
+
+gunicorn imports the app in the master before forking, and /api/ready reports
+the import time, but nothing fails when it regresses. This test does.
+"""
+import os
+import sys
+import json
+import subprocess
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# About 200 ms today; the headroom absorbs slow CI machines, not new imports
+BUDGET_MS = float(os.environ.get('TREASURYPRO_IMPORT_BUDGET_MS', '750'))
+HEAVY_MODULES = ['pandas', 'yfinance', 'openpyxl', 'numpy']
+
+PROBE = """
+import sys, json, time
+started = time.perf_counter()
+import app
+elapsed_ms = (time.perf_counter() - started) * 1000
+print(json.dumps({'ms': elapsed_ms, 'loaded': [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def import_app():
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE], cwd=APP_DIR, capture_output=True, text=True, timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_import_skips_heavy_modules():
+    assert import_app()['loaded'] == []
+
+
+def test_import_within_budget():
+    # Best of three, so one slow run on a busy machine doesn't fail the build
+    best = min(import_app()['ms'] for _ in range(3))
+    assert best < BUDGET_MS, f"importing app took {best:.0f} ms (budget {BUDGET_MS:.0f} ms)"
@@ -0,0 +1,88 @@
+"""RedisCache against a real server.
+
+Uses TREASURYPRO_TEST_REDIS_URL (default redis://localhost:6379/15) and skips
+when the redis package is missing or no server answers there. Keys go under
+a per-run prefix, which the fixture clears afterwards.
+"""
+import os
+import time
+import uuid
+
+import pytest
+
+from cache import MISS, MemoryCache, RedisCache, TieredCache, encode
+
+REDIS_URL = os.environ.get('TREASURYPRO_TEST_REDIS_URL', 'redis://localhost:6379/15')
+
+
+@pytest.fixture
+def backend():
+    pytest.importorskip('redis')
+    cache = RedisCache(REDIS_URL, prefix=f"treasurypro-test:{uuid.uuid4().hex}:")
+    try:
+        cache._conn().ping()
+    except Exception as e:
+        pytest.skip(f"no Redis server at {REDIS_URL}: {e}")
+    yield cache
+    cache.clear()
+
+
+def test_bytes_round_trip_and_delete(backend):
+    backend.set_bytes('k', b'value', 60)
+    assert backend.get_bytes('k') == b'value'
+    backend.delete('k')
+    assert backend.get_bytes('k') is None
+
+
+def test_entry_reports_expiry(backend):
+    backend.set_bytes('k', b'value', 60)
+    data, expires = backend.get_entry('k')
+    assert data == b'value'
+    assert 55 < expires - time.time() <= 60
+    assert backend.get_entry('missing') == (None, None)
+
+
+def test_expired_entries_are_gone(backend):
+    backend.set_bytes('k', b'value', 1)
+    time.sleep(1.2)
+    assert backend.get_bytes('k') is None
+
+
+def test_add_only_sets_absent_keys(backend):
+    assert backend.add_bytes('lease', b'first', 60)
+    assert not backend.add_bytes('lease', b'second', 60)
+    assert backend.get_bytes('lease') == b'first'
+
+
+def test_clear_only_touches_own_prefix(backend):
+    other = RedisCache(REDIS_URL, prefix=f"treasurypro-test:{uuid.uuid4().hex}:")
+    try:
+        other.set_bytes('k', b'other', 60)
+        backend.set_bytes('k', b'mine', 60)
+        backend.clear()
+        assert backend.get_bytes('k') is None
+        assert other.get_bytes('k') == b'other'
+    finally:
+        other.clear()
+
+
+def test_tiered_values_and_frames(backend):
+    pd = pytest.importorskip('pandas')
+    cache = TieredCache(backend, MemoryCache())
+    cache.set('json', {'a': [1, 2.5, None]}, 60)
+    frame = pd.DataFrame({'Close': [1.0, 2.0]}, index=pd.to_datetime(['2024-01-02', '2024-01-03']))
+    cache.set('frame', frame, 60)
+
+    # A second node: its own empty L1 over the same server
+    other = TieredCache(backend, MemoryCache())
+    assert other.get('json') == {'a': [1, 2.5, None]}
+    pd.testing.assert_frame_equal(other.get('frame'), frame, check_freq=False)
+    assert other.get('missing') is MISS
+
+
+def test_l1_copy_expires_with_l2_entry(backend):
+    cache = TieredCache(backend, MemoryCache(), l1_ttl=60)
+    backend.set_bytes('short', encode('v'), 1)
+    assert cache.get('short') == 'v'
+    time.sleep(1.2)
+    assert cache.get('short') is MISS
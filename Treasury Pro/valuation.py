@@ -0,0 +1,211 @@
+"""Monte Carlo DCF valuation.
+
+Each ticker is valued under thousands of scenarios at once. A scenario draws
+a starting free cash flow growth rate and a discount rate. Growth fades
+linearly to TERMINAL_GROWTH over YEARS, and a Gordon growth terminal value
+is added. Growth is centred on the ticker's historical FCF (or revenue)
+CAGR. The discount rate is centred on CAPM: the 10 year Treasury yield from
+the rates data plus beta times EQUITY_RISK_PREMIUM.
+
+All tickers in a batch are simulated together as (tickers x scenarios)
+arrays. Results are memoized in the shared cache by a hash of the inputs,
+and each ticker's random draws are seeded from that hash, so a ticker gets
+the same distribution whether it is valued alone or in a batch.
+"""
+import re
+import json
+import hashlib
+
+from cache import MISS, shared_cache
+from lazy import lazy_import
+import offload
+import statements
+
+np = lazy_import('numpy')
+
+SCENARIOS = 5000
+MAX_SCENARIOS = 20000
+YEARS = 5
+TERMINAL_GROWTH = 0.025
+EQUITY_RISK_PREMIUM = 0.055
+DEFAULT_RISK_FREE = 0.045
+GROWTH_BOUNDS = (-0.20, 0.30)
+GROWTH_VOL_BOUNDS = (0.02, 0.15)
+DISCOUNT_VOL = 0.01
+# Discount rate is kept at least this far above terminal growth
+MIN_SPREAD = 0.01
+PERCENTILES = [5, 10, 25, 50, 75, 90, 95]
+HISTOGRAM_BINS = 20
+VALUATION_TTL = 6 * 60 * 60
+# Batches at least this large are simulated in the offload process pool
+OFFLOAD_BATCH = 50
+
+
+def parse_percent(text):
+    """'3.92%' -> 0.0392; a range like '4.25-4.50%' gives its midpoint"""
+    numbers = [float(n) for n in re.findall(r'-?\d+(?:\.\d+)?', str(text))]
+    return sum(numbers) / len(numbers) / 100 if numbers else None
+
+
+def risk_free_rate(rates):
+    """(rate, source) from get_comprehensive_rates_data() output"""
+    rates = rates or {}
+    for row in rates.get('treasuryYields', []):
+        if row.get('maturity') == '10 Year' and parse_percent(row.get('yield')) is not None:
+            return parse_percent(row['yield']), '10 Year Treasury'
+    for row in rates.get('centralBankRates', []):
+        if row.get('country') == 'United States' and parse_percent(row.get('rate')) is not None:
+            return parse_percent(row['rate']), 'Federal Reserve policy rate'
+    return DEFAULT_RISK_FREE, 'default'
+
+
+def _growth(values):
+    """(CAGR, volatility of year-over-year growth) of an oldest-first series, or None"""
+    values = np.asarray(values, dtype='float64')
+    if len(values) < 2 or values[0] <= 0 or values[-1] <= 0:
+        return None
+    cagr = (values[-1] / values[0]) ** (1 / (len(values) - 1)) - 1
+    yoy = np.diff(values) / np.abs(values[:-1])
+    return float(cagr), float(np.std(yoy)) if len(yoy) > 1 else GROWTH_VOL_BOUNDS[0]
+
+
+def build_inputs(ticker, normalized, info, rates):
+    """Valuation inputs for one ticker from its canonical statements, info and rates data"""
+    fcf = [v for _, v in statements.series(normalized, 'free_cash_flow', YEARS)][::-1]
+    revenue = [v for _, v in statements.series(normalized, 'revenue', YEARS)][::-1]
+    history = _growth(fcf) or _growth(revenue) or (0.0, GROWTH_VOL_BOUNDS[1])
+    risk_free, risk_free_source = risk_free_rate(rates)
+    beta = info.get('beta') or 1.0
+    shares = info.get('sharesOutstanding') or statements.latest(normalized, 'shares_outstanding', 0)
+    net_debt = statements.latest(normalized, 'total_debt', 0) - statements.latest(normalized, 'cash', 0)
+    return {
+        'ticker': ticker.upper(),
+        'price': info.get('currentPrice', info.get('regularMarketPrice', 0)) or 0,
+        'baseFcf': fcf[-1] if fcf else 0,
+        'sharesOutstanding': float(shares or 0),
+        'netDebt': float(net_debt),
+        'growthMean': float(np.clip(history[0], *GROWTH_BOUNDS)),
+        'growthVol': float(np.clip(history[1], *GROWTH_VOL_BOUNDS)),
+        'beta': float(np.clip(beta, 0.5, 2.5)),
+        'riskFree': risk_free,
+        'riskFreeSource': risk_free_source,
+        'discountMean': risk_free + float(np.clip(beta, 0.5, 2.5)) * EQUITY_RISK_PREMIUM,
+        'discountVol': DISCOUNT_VOL,
+        'terminalGrowth': TERMINAL_GROWTH,
+        'years': YEARS
+    }
+
+
+def input_hash(inputs):
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()[:20]
+
+
+def simulate(batch, scenarios=SCENARIOS):
+    """Per-share fair values, a (tickers x scenarios) array, for a list of inputs"""
+    def column(name):
+        return np.array([inputs[name] for inputs in batch], dtype='float64')[:, None]
+
+    # Per-ticker seeds keep each ticker's draws independent of the rest of the batch
+    z = np.stack([
+        np.random.default_rng(int(input_hash(inputs), 16)).standard_normal((2, scenarios))
+        for inputs in batch
+    ], axis=1)
+    terminal = column('terminalGrowth')
+    growth = np.clip(column('growthMean') + column('growthVol') * z[0], *GROWTH_BOUNDS)
+    discount = np.maximum(column('discountMean') + column('discountVol') * z[1], terminal + MIN_SPREAD)
+    years = batch[0]['years']
+
+    fcf = np.repeat(column('baseFcf'), scenarios, axis=1)
+    factor = np.ones_like(fcf)
+    present_value = np.zeros_like(fcf)
+    for year in range(1, years + 1):
+        fade = (year - 1) / max(years - 1, 1)
+        fcf = fcf * (1 + growth * (1 - fade) + terminal * fade)
+        factor = factor / (1 + discount)
+        present_value += fcf * factor
+    terminal_value = fcf * (1 + terminal) / (discount - terminal) * factor
+    equity = present_value + terminal_value - column('netDebt')
+    return equity / column('sharesOutstanding')
+
+
+def summarize(values, batch):
+    """Percentiles, moments and a histogram of each row of fair values, in one pass over the batch"""
+    tickers, scenarios = values.shape
+    points = np.percentile(values, PERCENTILES, axis=1).T
+    means, stds = values.mean(axis=1), values.std(axis=1)
+    prices = np.array([inputs['price'] for inputs in batch], dtype='float64')[:, None]
+    undervalued = (values > prices).mean(axis=1)
+
+    # Histogram between each row's outer percentiles, via one bincount over all rows
+    lo, hi = points[:, :1], points[:, -1:]
+    width = np.where(hi > lo, hi - lo, 1.0)
+    bins = np.floor((values - lo) / width * HISTOGRAM_BINS).astype('int64')
+    bins[values == hi] = HISTOGRAM_BINS - 1
+    inside = (bins >= 0) & (bins < HISTOGRAM_BINS)
+    offsets = np.arange(tickers)[:, None] * HISTOGRAM_BINS
+    counts = np.bincount((bins + offsets)[inside], minlength=tickers * HISTOGRAM_BINS).reshape(tickers, -1)
+    edges = lo + width * np.linspace(0, 1, HISTOGRAM_BINS + 1)
+
+    summaries = []
+    for row, inputs in enumerate(batch):
+        price = inputs['price']
+        median = float(points[row, PERCENTILES.index(50)])
+        summaries.append({
+            'symbol': inputs['ticker'],
+            'price': price,
+            'scenarios': scenarios,
+            'fairValue': {
+                'mean': float(means[row]),
+                'std': float(stds[row]),
+                'percentiles': {f'p{p}': float(v) for p, v in zip(PERCENTILES, points[row])}
+            },
+            'upsidePercent': (median / price - 1) * 100 if price > 0 else None,
+            'probabilityUndervalued': float(undervalued[row]) if price > 0 else None,
+            'histogram': {'edges': edges[row].tolist(), 'counts': counts[row].tolist()},
+            'assumptions': {k: inputs[k] for k in [
+                'baseFcf', 'growthMean', 'growthVol', 'beta', 'riskFree', 'riskFreeSource',
+                'discountMean', 'discountVol', 'terminalGrowth', 'years', 'netDebt', 'sharesOutstanding'
+            ]}
+        })
+    return summaries
+
+
+def _invalid(inputs):
+    if inputs['baseFcf'] <= 0:
+        return 'Free cash flow is not positive, so a DCF valuation is not meaningful'
+    if inputs['sharesOutstanding'] <= 0:
+        return 'Shares outstanding not available'
+    return None
+
+
+def value_many(batch, scenarios=SCENARIOS):
+    """Valuation summaries for a list of inputs, in order; memoized by input hash"""
+    scenarios = max(100, min(int(scenarios), MAX_SCENARIOS))
+    results = [None] * len(batch)
+    pending = []
+    for i, inputs in enumerate(batch):
+        error = _invalid(inputs)
+        if error:
+            results[i] = {'symbol': inputs['ticker'], 'error': error}
+            continue
+        key = f"valuation:{input_hash(inputs)}:{scenarios}"
+        cached = shared_cache.get(key)
+        if cached is MISS:
+            pending.append((i, key))
+        else:
+            results[i] = dict(cached, cached=True)
+
+    if pending:
+        pending_batch = [batch[i] for i, _ in pending]
+        if len(pending_batch) >= OFFLOAD_BATCH:
+            summaries = offload.valuation_summaries(pending_batch, scenarios)
+        else:
+            summaries = summarize(simulate(pending_batch, scenarios), pending_batch)
+        for summary, (i, key) in zip(summaries, pending):
+            shared_cache.set(key, summary, VALUATION_TTL)
+            results[i] = dict(summary, cached=False)
+    return results
+
+
+def value(inputs, scenarios=SCENARIOS):
+    return value_many([inputs], scenarios)[0]
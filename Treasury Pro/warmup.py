@@ -0,0 +1,257 @@
+"""Pre-market cache warm-up.
+
+Prefetches the full analysis (statements, price history, peers, events,
+news) for a ticker universe, plus the shared rates and macro datasets, into
+the shared cache so the first dashboard user of the day gets a cache hit.
+Tickers are warmed in parallel, but every upstream request draws from one
+rate budget. Progress is checkpointed after each ticker, so an interrupted
+run picks up where it stopped when started again the same day.
+
+Usage:
+    python warmup.py [--universe FILE ...] [--tickers AAPL,MSFT] [--workers 8]
+                     [--rate 5] [--refresh] [--fresh] [--min-coverage 0.9]
+
+The universe is every ticker in the --universe files (one per line or comma
+separated, '#' starts a comment; defaults to $TREASURYPRO_UNIVERSE), the
+--tickers list and the watchlist (TREASURYPRO_WATCHLIST). Point
+TREASURYPRO_CACHE_URL / TREASURYPRO_CACHE_PATH at the same cache as the
+servers.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import market_data
+import watchlist
+from cache import CACHE_PATH, MISS
+from ratelimit import TokenBucket
+
+CHECKPOINT_PATH = os.environ.get(
+    'TREASURYPRO_WARMUP_CHECKPOINT',
+    os.path.join(os.path.dirname(CACHE_PATH), 'warmup.checkpoint.json')
+)
+
+# Price histories the analysis reads (Sharpe ratio, annual P/E)
+HISTORY_PERIODS = ['3y', '5y']
+
+
+def load_universe(paths):
+    """Tickers from universe files, in file order"""
+    tickers = []
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                line = line.split('#', 1)[0]
+                tickers.extend(t.strip().upper() for t in line.split(',') if t.strip())
+    return tickers
+
+
+def build_universe(paths, extra=None, include_watchlist=True):
+    """Universe files + extra tickers + watchlist, de-duplicated, order kept"""
+    tickers = load_universe(paths)
+    if extra:
+        tickers += watchlist.parse(extra)
+    if include_watchlist:
+        tickers += watchlist.tickers()
+    return list(dict.fromkeys(tickers))
+
+
+class Checkpoint:
+    """Per-run record of finished tickers, rewritten after every ticker.
+
+    A run is identified by ``run_key`` (today's date by default); a saved
+    checkpoint from a different run is ignored.
+    """
+
+    def __init__(self, path=CHECKPOINT_PATH, fresh=False, run_key=None):
+        self.path = path
+        self.run_key = run_key or date.today().isoformat()
+        self.done = {}
+        self.failed = {}
+        self._lock = threading.Lock()
+        if not fresh and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    saved = json.load(f)
+                if saved.get('runKey') == self.run_key:
+                    self.done = saved.get('done', {})
+            except Exception as e:
+                print(f"Ignoring unreadable checkpoint {path}: {e}")
+
+    def record(self, ticker, outcome, error=None):
+        with self._lock:
+            if error is None:
+                self.done[ticker] = outcome
+                self.failed.pop(ticker, None)
+            else:
+                self.failed[ticker] = error
+            self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({'runKey': self.run_key, 'done': self.done, 'failed': self.failed}, f)
+        os.replace(tmp, self.path)
+
+
+def run_tickers(tickers, job, checkpoint, workers, label, outcome=None):
+    """Run job(ticker) on a thread pool for every ticker not yet in the checkpoint.
+
+    Each result is recorded in the checkpoint (as ``outcome(result)`` if
+    given) and failures are recorded with their error. Returns the results
+    of this run by ticker and the per-ticker durations in seconds.
+    """
+    pending = [t for t in tickers if t not in checkpoint.done]
+    if len(pending) < len(tickers):
+        print(f"Resuming: {len(tickers) - len(pending)} of {len(tickers)} tickers already done")
+
+    started = time.perf_counter()
+    results = {}
+    durations = []
+    completed = 0
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=label.lower())
+
+    def timed(ticker):
+        job_started = time.perf_counter()
+        result = job(ticker)
+        return result, time.perf_counter() - job_started
+
+    try:
+        futures = {executor.submit(timed, t): t for t in pending}
+        for future in as_completed(futures):
+            ticker = futures[future]
+            try:
+                result, seconds = future.result()
+                durations.append(seconds)
+                results[ticker] = result
+                checkpoint.record(ticker, outcome(result) if outcome else result)
+            except Exception as e:
+                print(f"{label} failed for {ticker}: {e}")
+                checkpoint.record(ticker, None, str(e))
+            completed += 1
+            if completed % 25 == 0 or completed == len(pending):
+                print(f"{label} progress: {completed}/{len(pending)} "
+                      f"({time.perf_counter() - started:.0f}s elapsed)")
+    except KeyboardInterrupt:
+        print("Interrupted; run again to resume from the checkpoint")
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+    return results, durations
+
+
+def duration_stats(durations):
+    """p50 and max of per-ticker durations, for run reports"""
+    durations = sorted(durations)
+    return {
+        'p50': round(durations[len(durations) // 2], 2) if durations else None,
+        'max': round(durations[-1], 2) if durations else None
+    }
+
+
+def warm_macro(app):
+    """Rates, World Bank and Fed datasets shared by every analysis; returns seconds per dataset"""
+    timings = {}
+    for name, loader in [
+        ('rates', app.get_comprehensive_rates_data),
+        ('worldBank', app.get_world_bank_economic_indicators),
+        ('fed', app.get_fed_economic_data)
+    ]:
+        started = time.perf_counter()
+        try:
+            loader()
+        except Exception as e:
+            print(f"Warm-up error for {name}: {e}")
+        timings[name] = round(time.perf_counter() - started, 2)
+    return timings
+
+
+def warm_ticker(app, ticker, refresh=False):
+    """Warm one ticker; returns 'cached' or 'warmed', raises on failure"""
+    if refresh:
+        app.fetch_financial_data.invalidate(ticker)
+        market_data.get_info.invalidate(ticker)
+        for period in HISTORY_PERIODS:
+            market_data.get_history.invalidate(ticker, period)
+    elif app.fetch_financial_data.peek(ticker) is not MISS:
+        return 'cached'
+
+    # Components first, so they stay cached even if the full analysis fails
+    market_data.get_info(ticker)
+    market_data.get_statements(ticker)
+    for period in HISTORY_PERIODS:
+        market_data.get_history(ticker, period)
+    # The analysis's own upstream calls (calendar, news, web search) draw from the budget too
+    if app.fetch_financial_data(ticker) is None:
+        raise RuntimeError('analysis failed')
+    return 'warmed'
+
+
+def run(tickers, workers=8, rate=5.0, refresh=False, fresh=False, macro=True,
+        checkpoint_path=CHECKPOINT_PATH):
+    """Warm ``tickers`` and return a coverage/duration report"""
+    import app
+
+    started = time.perf_counter()
+    budget = TokenBucket(rate, burst=max(1, rate * 2))
+    market_data.upstream_budget = budget
+    checkpoint = Checkpoint(checkpoint_path, fresh=fresh)
+    report = {'macroSeconds': warm_macro(app) if macro else {}}
+    _, durations = run_tickers(tickers, lambda t: warm_ticker(app, t, refresh), checkpoint, workers, 'Warm-up')
+
+    outcomes = [checkpoint.done.get(t) for t in tickers]
+    report.update({
+        'tickers': len(tickers),
+        'warmed': outcomes.count('warmed'),
+        'alreadyCached': outcomes.count('cached'),
+        'failed': checkpoint.failed,
+        'coverage': round(sum(o is not None for o in outcomes) / len(tickers), 4) if tickers else 1.0,
+        'tickerSeconds': duration_stats(durations),
+        'upstream': budget.stats(),
+        'durationSeconds': round(time.perf_counter() - started, 1)
+    })
+    market_data.upstream_budget = None
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Warm the shared cache before market open')
+    parser.add_argument('--universe', action='append',
+                        help='ticker list file (repeatable; default $TREASURYPRO_UNIVERSE)')
+    parser.add_argument('--tickers', help='extra comma-separated tickers')
+    parser.add_argument('--no-watchlist', action='store_true', help='skip the watchlist tickers')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('TREASURYPRO_WARMUP_WORKERS', '8')))
+    parser.add_argument('--rate', type=float, default=float(os.environ.get('TREASURYPRO_WARMUP_RATE', '5')),
+                        help='upstream requests per second across all workers')
+    parser.add_argument('--refresh', action='store_true',
+                        help='refetch info, prices and the analysis even if still cached')
+    parser.add_argument('--fresh', action='store_true', help="ignore today's checkpoint")
+    parser.add_argument('--no-macro', action='store_true', help='skip rates and World Bank/Fed data')
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH)
+    parser.add_argument('--min-coverage', type=float, default=0.9,
+                        help='exit non-zero below this fraction of tickers warmed')
+    args = parser.parse_args(argv)
+
+    paths = args.universe or [p for p in [os.environ.get('TREASURYPRO_UNIVERSE')] if p]
+    tickers = build_universe(paths, args.tickers, not args.no_watchlist)
+    if not tickers:
+        parser.error('no tickers to warm')
+    print(f"Warming {len(tickers)} tickers with {args.workers} workers at {args.rate:g} upstream requests/s")
+
+    try:
+        report = run(tickers, args.workers, args.rate, args.refresh, args.fresh,
+                     not args.no_macro, args.checkpoint)
+    except KeyboardInterrupt:
+        return 130
+    print(json.dumps(report, indent=2))
+    return 0 if report['coverage'] >= args.min_coverage else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
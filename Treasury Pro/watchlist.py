@@ -0,0 +1,64 @@
+"""Set of tickers tracked by the background pollers.
+
+Seeded from the TREASURYPRO_WATCHLIST environment variable (comma separated)
+and extended with every ticker a user looks up, so pollers keep warm data for
+whatever the dashboard is actually being used for. The added tickers live in
+the shared cache, so every worker process sees the same watchlist.
+"""
+import os
+import re
+
+from cache import MISS, shared_cache
+
+DEFAULT_WATCHLIST = 'AAPL,MSFT,GOOGL,AMZN,META,TSLA,JPM,XOM'
+MAX_TICKERS = int(os.environ.get('TREASURYPRO_WATCHLIST_MAX', '500'))
+WATCHLIST_KEY = 'watchlist:added'
+WATCHLIST_TTL = 365 * 24 * 60 * 60
+# Exchange symbols such as BRK-B, RDS.A, ^GSPC, EURUSD=X
+TICKER_PATTERN = re.compile(r'^[A-Z0-9^][A-Z0-9.\-=^]{0,14}$')
+
+_seed = {
+    t.strip().upper()
+    for t in os.environ.get('TREASURYPRO_WATCHLIST', DEFAULT_WATCHLIST).split(',')
+    if t.strip()
+}
+
+
+def valid(ticker):
+    """True if ``ticker`` looks like an exchange symbol"""
+    return bool(TICKER_PATTERN.match(ticker.upper()))
+
+
+def _added(fresh=False):
+    added = shared_cache.get(WATCHLIST_KEY, fresh=fresh)
+    return [] if added is MISS else added
+
+
+def add(ticker):
+    """Track a ticker; returns True if it was not tracked before"""
+    ticker = ticker.upper()
+    if ticker in _seed or not valid(ticker):
+        return False
+    written = False
+    # Read-modify-write across processes: re-read after writing and retry if
+    # a concurrent add from another worker replaced ours
+    for _ in range(3):
+        added = _added(fresh=True)
+        if ticker in added:
+            return written
+        if len(_seed) + len(added) >= MAX_TICKERS:
+            return False
+        shared_cache.set(WATCHLIST_KEY, added + [ticker], WATCHLIST_TTL)
+        written = True
+    return written
+
+
+def tickers():
+    return sorted(_seed.union(_added()))
+
+
+def parse(param):
+    """Parse a ``tickers=AAPL,MSFT`` query value; empty means the whole watchlist"""
+    if not param:
+        return tickers()
+    return [t.strip().upper() for t in param.split(',') if t.strip()]
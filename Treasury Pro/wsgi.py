@@ -0,0 +1,5 @@
+"""WSGI entry point for production servers: `gunicorn -c gunicorn.conf.py`"""
+from app import create_app
+
+# Warm-up runs per worker after fork (post_fork in gunicorn.conf.py)
+app = create_app(warm=False)